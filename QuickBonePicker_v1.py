@@ -19,55 +19,1318 @@ import bpy
 import gpu
 import blf
 from gpu_extras.batch import batch_for_shader
-from bpy.props import StringProperty, CollectionProperty, IntProperty, FloatProperty, BoolProperty
+from mathutils import Matrix
+from bpy.props import StringProperty, CollectionProperty, IntProperty, FloatProperty, BoolProperty, EnumProperty
 from bpy.types import Operator, Panel, PropertyGroup, SpaceView3D
+from bpy.app.handlers import persistent
 import os
+import math
+import numpy as np
 from PIL import Image, ImageDraw, ImageFont
 import time
+import re
+import struct
+import base64
+import io
+import sqlite3
+from collections import OrderedDict
 
-# Global dictionary to store loaded textures
-_loaded_textures = {}
+# Global dictionary to store loaded textures, least recently used first
+# Key: image name -> (change stamp, GPU texture, size in bytes)
+_loaded_textures = OrderedDict()
+_loaded_textures_bytes = 0
+
+# Bumped whenever an image is replaced so its cached texture goes stale
+_texture_generations = {}
+
+# Bumped whenever buttons are removed or replaced, or a single button's
+# move can't be patched into the spatial index, so it is rebuilt
+_layout_revision = 0
+
+# Set when anything drawn on the canvas changed
+# The picker's modal operator turns it into a (rate limited) redraw
+_canvas_dirty = False
+
+def _tag_canvas_dirty():
+    global _canvas_dirty
+    _canvas_dirty = True
+
+# Bumped whenever a button changes section, z_order, visibility or type
+# so the per-section draw order is sorted again
+_order_revision = 0
+
+# Bumped whenever a locked empty button is edited or enters/leaves that state
+# so the offscreen copy of the static background is rendered again
+_static_revision = 0
+
+# Bumped whenever a button's pose changes or buttons become or stop being
+# pose buttons, so the pose matrices of the nearest pose search are rebuilt
+_pose_revision = 0
+
+def _tag_layout_changed():
+    global _layout_revision
+    _layout_revision += 1
+    _tag_canvas_dirty()
+
+def _tag_static_changed():
+    global _static_revision
+    _static_revision += 1
+    _tag_canvas_dirty()
+
+def _tag_order_changed():
+    global _order_revision
+    _order_revision += 1
+    _tag_canvas_dirty()
+
+def _tag_poses_changed():
+    global _pose_revision
+    _pose_revision += 1
+
+def _on_button_layout_update(self, context):
+    # Moves and resizes patch the spatial index instead of rebuilding it
+    if not _update_spatial_entry(self):
+        _tag_layout_changed()
+    _tag_canvas_dirty()
+    if self.is_empty and self.is_locked:
+        _tag_static_changed()
+
+def _on_button_style_update(self, context):
+    _tag_canvas_dirty()
+    if self.is_empty and self.is_locked:
+        _tag_static_changed()
+
+def _on_button_static_update(self, context):
+    """Locking, unlocking or changing the button type moves it in or out of the static layer"""
+    _tag_static_changed()
+
+def _on_button_order_update(self, context):
+    _tag_order_changed()
+    _on_button_style_update(self, context)
+
+def _on_button_section_update(self, context):
+    _tag_order_changed()
+    _on_button_layout_update(self, context)
+
+def _on_button_type_update(self, context):
+    _tag_order_changed()
+    _tag_static_changed()
+
+def _on_button_pose_update(self, context):
+    _tag_poses_changed()
+    _tag_canvas_dirty()
+
+@persistent
+def _on_buttons_reloaded(*args):
+    """Undo, redo and file loads replace the button collection"""
+    _tag_layout_changed()
+    _tag_static_changed()
+    _tag_order_changed()
+    _tag_poses_changed()
+
+# Selected bone names per armature, read by the canvas and the panel
+# Key: armature object pointer -> (selection revision, frozenset of bone names)
+# Bumping the revision on selection notifications marks every entry stale
+_selected_bones = {}
+_selection_revision = 0
+_selection_msgbus_owner = object()
+
+def _tag_selection_changed(*args):
+    global _selection_revision
+    _selection_revision += 1
+    _tag_canvas_dirty()
+
+def _get_selected_bone_names(context, obj=None):
+    """Names of an armature's selected pose bones, cached until the selection changes"""
+    if obj is None:
+        obj = context.active_object
+    if not obj or obj.type != 'ARMATURE' or context.mode != 'POSE':
+        return frozenset()
+    
+    key = obj.as_pointer()
+    entry = _selected_bones.get(key)
+    if entry is not None and entry[0] == _selection_revision:
+        return entry[1]
+    
+    names = frozenset()
+    try:
+        names = frozenset(bone.name for bone in context.selected_pose_bones if bone.id_data == obj)
+    except:
+        pass
+    _selected_bones[key] = (_selection_revision, names)
+    return names
+
+# Bone name -> index lookups, so clicks don't search bones by name
+# Key: (armature pointer, 'POSE' or 'DATA') -> (bone names, {name: index})
+# The 'DATA' names double as the snapshot renames are detected against
+_bone_indices = {}
+
+def _bone_index_map(obj, kind='POSE'):
+    """Name to index map of an armature's pose bones ('POSE') or bones ('DATA')"""
+    bones = obj.pose.bones if kind == 'POSE' else obj.data.bones
+    key = (obj.data.as_pointer(), kind)
+    entry = _bone_indices.get(key)
+    if entry is None or len(entry[0]) != len(bones):
+        names = tuple(bone.name for bone in bones)
+        entry = (names, {name: index for index, name in enumerate(names)})
+        if kind == 'DATA':
+            # Rest positions let the rename tracker tell renamed bones from new ones
+            entry += (_bone_rest_positions(obj.data),)
+        _bone_indices[key] = entry
+    return entry[1]
+
+def _resolve_bone(obj, bone_name):
+    """The pose bone a button points at, or None if the armature has no such bone"""
+    for attempt in range(2):
+        index = _bone_index_map(obj, 'POSE').get(bone_name)
+        if index is None:
+            return None
+        pose_bone = obj.pose.bones[index]
+        if pose_bone.name == bone_name:
+            return pose_bone
+        # Bones changed without a notification, look them up again
+        _bone_indices.pop((obj.data.as_pointer(), 'POSE'), None)
+    return None
+
+def _resolve_bone_indices(obj, bone_names):
+    """Pose bone indices of several bones, None for names the armature doesn't have"""
+    bones = obj.pose.bones
+    for attempt in range(2):
+        bone_indices = _bone_index_map(obj, 'POSE')
+        indices = [bone_indices.get(bone_name) for bone_name in bone_names]
+        if all(index is not None and bones[index].name == bone_name for index, bone_name in zip(indices, bone_names)):
+            break
+        # Bones changed without a notification, look them up again
+        _bone_indices.pop((obj.data.as_pointer(), 'POSE'), None)
+    return indices
+
+def _rename_button_bones(armature, renames):
+    """Point buttons at the new names of an armature's renamed bones
+    
+    Only scenes with an object using the armature are updated, and names
+    another armature in the scene still has are left alone.
+    """
+    for scene in bpy.data.scenes:
+        armatures = {obj.data for obj in scene.objects if obj.type == 'ARMATURE'}
+        if armature not in armatures:
+            continue
+        armatures.discard(armature)
+        scene_renames = {old: new for old, new in renames.items()
+                         if not any(old in other.bones for other in armatures)}
+        if not scene_renames:
+            continue
+        for item in scene.bone_picker_buttons:
+            if item.bone_name in scene_renames:
+                item.bone_name = scene_renames[item.bone_name]
+
+def _bone_rest_positions(armature):
+    """Head and tail of every bone in armature space, one row per bone"""
+    bones = armature.bones
+    heads = np.empty(len(bones) * 3, dtype=np.float32)
+    tails = np.empty(len(bones) * 3, dtype=np.float32)
+    bones.foreach_get("head_local", heads)
+    bones.foreach_get("tail_local", tails)
+    return np.hstack((heads.reshape(-1, 3), tails.reshape(-1, 3)))
+
+def _track_bone_renames(armature):
+    """Compare an armature's bone names with the last snapshot and follow renames
+    
+    Bones that kept their index and rest position but changed to a name that
+    didn't exist before are treated as renamed. When bones were also added or
+    removed, a vanished name is renamed to the one new bone with the same
+    head and tail.
+    """
+    key = (armature.as_pointer(), 'DATA')
+    entry = _bone_indices.get(key)
+    names = tuple(bone.name for bone in armature.bones)
+    if entry is not None and entry[0] == names:
+        return
+    
+    rest = _bone_rest_positions(armature)
+    if entry is not None:
+        old_names, old_rest = entry[1], entry[2]
+        new_names = {name: index for index, name in enumerate(names)}
+        renames = {}
+        if len(entry[0]) == len(names):
+            renames = {old: new for index, (old, new) in enumerate(zip(entry[0], names))
+                       if old != new and old not in new_names and new not in old_names
+                       and np.allclose(rest[index], old_rest[index], atol=1e-5)}
+        
+        # Fall back to matching rest positions for the names left over
+        renamed = set(renames.values())
+        added = [new_names[name] for name in names if name not in old_names and name not in renamed]
+        for old, index in old_names.items():
+            if old in new_names or old in renames or not added:
+                continue
+            same = [new for new in added if np.allclose(rest[new], old_rest[index], atol=1e-5)]
+            if len(same) == 1:
+                renames[old] = names[same[0]]
+                added.remove(same[0])
+        if renames:
+            _rename_button_bones(armature, renames)
+    
+    _bone_indices[key] = (names, {name: index for index, name in enumerate(names)}, rest)
+    _bone_indices.pop((armature.as_pointer(), 'POSE'), None)
+
+def _on_bone_renamed(*args):
+    for armature in bpy.data.armatures:
+        if (armature.as_pointer(), 'DATA') in _bone_indices:
+            _track_bone_renames(armature)
+
+@persistent
+def _on_depsgraph_update(scene, depsgraph):
+    """Selecting bones tags the armature object, editing bones the armature"""
+    for update in depsgraph.updates:
+        if isinstance(update.id, bpy.types.Armature):
+            _track_bone_renames(update.id.original)
+            _tag_selection_changed()
+        elif isinstance(update.id, bpy.types.Object) and update.id.type == 'ARMATURE':
+            _tag_selection_changed()
+
+def _subscribe_bone_notifications():
+    """Listen for select flag changes and bone renames
+    
+    Blender 5.x stores the select flag on pose bones.
+    """
+    bpy.msgbus.clear_by_owner(_selection_msgbus_owner)
+    for bone_type in (bpy.types.Bone, bpy.types.PoseBone):
+        if 'select' in bone_type.bl_rna.properties:
+            bpy.msgbus.subscribe_rna(
+                key=(bone_type, "select"),
+                owner=_selection_msgbus_owner,
+                args=(),
+                notify=_tag_selection_changed,
+            )
+    bpy.msgbus.subscribe_rna(
+        key=(bpy.types.Bone, "name"),
+        owner=_selection_msgbus_owner,
+        args=(),
+        notify=_on_bone_renamed,
+    )
+
+# Where bone selection is stored: 'POSE_BONE' (PoseBone.select, Blender 5.x),
+# 'BONE' (Bone.select, Blender 2.8-4.x) or None if neither exposes it
+_selection_backend = None
+_selection_backend_checked = False
+
+def _get_selection_backend():
+    """Find which bone struct holds the select flag in this Blender version"""
+    global _selection_backend, _selection_backend_checked
+    if not _selection_backend_checked:
+        _selection_backend_checked = True
+        try:
+            if 'select' in bpy.types.PoseBone.bl_rna.properties:
+                _selection_backend = 'POSE_BONE'
+            elif 'select' in bpy.types.Bone.bl_rna.properties:
+                _selection_backend = 'BONE'
+        except:
+            _selection_backend = None
+    return _selection_backend
+
+def _select_bones(obj, bone_names, action='SELECT', extend=True):
+    """Select, deselect or toggle several bones of an armature in one pass
+    
+    Without extend every other bone is deselected. The select flags are read
+    and written as one array and the armature is tagged for a single update.
+    Returns False if the flags couldn't be written and the caller has to
+    fall back to selecting in edit mode.
+    """
+    backend = _get_selection_backend()
+    if backend == 'POSE_BONE':
+        bones = obj.pose.bones
+        bone_indices = _bone_index_map(obj, 'POSE')
+    elif backend == 'BONE':
+        bones = obj.data.bones
+        bone_indices = _bone_index_map(obj, 'DATA')
+    else:
+        return False
+    
+    try:
+        count = len(bones)
+        selected = np.zeros(count, dtype=bool)
+        if extend:
+            bones.foreach_get("select", selected)
+        
+        indices = [bone_indices.get(bone_name, -1) for bone_name in bone_names]
+        indices = np.array([index for index in indices if index >= 0], dtype=np.int64)
+        if action == 'SELECT':
+            selected[indices] = True
+        elif action == 'DESELECT':
+            selected[indices] = False
+        elif action == 'TOGGLE':
+            selected[indices] = ~selected[indices]
+        
+        bones.foreach_set("select", selected)
+    except:
+        return False
+    
+    # foreach_set skips the per-bone update, tag the rig once instead
+    obj.update_tag()
+    if backend == 'BONE':
+        # The flag lives on the armature, which other objects can share
+        obj.data.update_tag()
+    _tag_selection_changed()
+    return True
+
+@persistent
+def _on_file_loaded(*args):
+    """Message bus subscriptions don't survive loading a file"""
+    _selected_bones.clear()
+    _bone_indices.clear()
+    _pose_matrices.clear()
+    _pose_matches.clear()
+    _tag_selection_changed()
+    _subscribe_bone_notifications()
+
+def _button_index(item):
+    """Index of a button in its scene's collection, or -1"""
+    try:
+        # "bone_picker_buttons[12]" -> 12
+        return int(item.path_from_id().rsplit('[', 1)[1].rstrip(']'))
+    except:
+        return -1
+
+# Binary pose format, stored base64 encoded in BonePickerButton.pose_blob
+#   b'QBP3', uint32 bone count, uint8 flags (_POSE_PARTIAL)
+#   per bone: uint16 name length, utf-8 name
+#   uint8 rotation mode per bone (index into _ROTATION_MODES)
+#   uint8 channel mask per bone (_POSE_LOCATION | _POSE_ROTATION | _POSE_SCALE)
+#   uint16 component mask per bone, one bit per location, rotation and scale component
+#   float32 quantization step per bone and channel that has a stored component
+#   int16 offsets from rest, component by component, for the bones whose mask has the component
+# Quaternions are stored as w, x, y, z, axis angle as angle, x, y, z and eulers as x, y, z, 0.
+# Components left out are at rest. Channels left out of a full pose are at
+# rest, channels left out of a partial pose are not touched when it is applied.
+# b'QBP2' poses store float32 location, rotation and scale rows for the
+# bones whose channel mask has the channel, instead of the component mask and offsets.
+# b'QBP1' poses have no flags or masks and store every channel of every bone.
+_POSE_MAGIC = b'QBP3'
+_POSE_MAGIC_V2 = b'QBP2'
+_POSE_MAGIC_V1 = b'QBP1'
+_ROTATION_MODES = ('QUATERNION', 'XYZ', 'XZY', 'YXZ', 'YZX', 'ZXY', 'ZYX', 'AXIS_ANGLE')
+_POSE_LOCATION = 1
+_POSE_ROTATION = 2
+_POSE_SCALE = 4
+_POSE_ALL_CHANNELS = _POSE_LOCATION | _POSE_ROTATION | _POSE_SCALE
+_POSE_PARTIAL = 1
+# Channels a pose can be applied with, for ENUM_FLAG properties
+_POSE_CHANNEL_ITEMS = (
+    ('LOCATION', "Location", "Apply bone locations"),
+    ('ROTATION', "Rotation", "Apply bone rotations"),
+    ('SCALE', "Scale", "Apply bone scales"),
+)
+_POSE_CHANNEL_BITS = {'LOCATION': _POSE_LOCATION, 'ROTATION': _POSE_ROTATION, 'SCALE': _POSE_SCALE}
+# Channels closer than this to the rest or base pose are not stored
+_POSE_TOLERANCE = 1e-5
+# Channel of each of the 10 stored components, and where each channel starts
+_POSE_COMPONENT_CHANNELS = np.array((0, 0, 0, 1, 1, 1, 1, 2, 2, 2))
+_POSE_CHANNEL_STARTS = (0, 3, 7)
+
+class _Pose:
+    """Decoded pose, one row per bone
+    
+    channels holds the channel mask of every bone, only the channels in it
+    are applied.
+    """
+    
+    def __init__(self, names, modes, location, rotation, scale, channels=None, partial=False):
+        self.names = names
+        self.modes = modes
+        self.location = location
+        self.rotation = rotation
+        self.scale = scale
+        if channels is None:
+            channels = np.full(len(names), _POSE_ALL_CHANNELS, dtype=np.uint8)
+        self.channels = channels
+        self.partial = partial
+
+def _rest_rotation(modes):
+    """(n, 4) rest rotations in the stored layout of each mode"""
+    rotation = np.zeros((len(modes), 4), dtype=np.float32)
+    rotation[modes == _ROTATION_MODES.index('QUATERNION'), 0] = 1.0
+    rotation[modes == _ROTATION_MODES.index('AXIS_ANGLE'), 2] = 1.0
+    return rotation
+
+def _rest_components(modes):
+    """(n, 10) rest values of the location, rotation and scale components"""
+    count = len(modes)
+    return np.concatenate((np.zeros((count, 3), dtype=np.float32), _rest_rotation(modes),
+                           np.ones((count, 3), dtype=np.float32)), axis=1)
+
+def _encode_pose(pose, quantize=True):
+    """Pack a pose into the base64 text stored on a button
+    
+    Components at rest are left out and the others are quantized to 16 bits
+    with a step per bone and channel. quantize=False writes the float32 QBP2 format.
+    """
+    channels = np.asarray(pose.channels, dtype=np.uint8)
+    modes = np.asarray(pose.modes, dtype=np.uint8)
+    parts = [_POSE_MAGIC if quantize else _POSE_MAGIC_V2,
+             struct.pack('<IB', len(pose.names), _POSE_PARTIAL if pose.partial else 0)]
+    for name in pose.names:
+        encoded = name.encode('utf-8')
+        parts.append(struct.pack('<H', len(encoded)))
+        parts.append(encoded)
+    parts.append(modes.tobytes())
+    parts.append(channels.tobytes())
+    
+    if not quantize:
+        for values, channel in ((pose.location, _POSE_LOCATION), (pose.rotation, _POSE_ROTATION), (pose.scale, _POSE_SCALE)):
+            rows = (channels & channel) != 0
+            parts.append(np.ascontiguousarray(values[rows], dtype='<f4').tobytes())
+        return base64.b64encode(b''.join(parts)).decode('ascii')
+    
+    offsets = np.concatenate((pose.location, pose.rotation, pose.scale), axis=1).astype(np.float64) - _rest_components(modes)
+    stored = np.abs(offsets) > _POSE_TOLERANCE
+    # Channels outside the mask are never applied
+    stored[(channels & _POSE_LOCATION) == 0, 0:3] = False
+    stored[(channels & _POSE_ROTATION) == 0, 3:7] = False
+    stored[(channels & _POSE_SCALE) == 0, 7:10] = False
+    parts.append((stored << np.arange(10)).sum(axis=1).astype('<u2').tobytes())
+    # One step per bone and channel, so a root offset of metres doesn't
+    # coarsen the small offsets of every other bone
+    largest = np.maximum.reduceat(np.where(stored, np.abs(offsets), 0.0), _POSE_CHANNEL_STARTS, axis=1)
+    channel_stored = np.logical_or.reduceat(stored, _POSE_CHANNEL_STARTS, axis=1)
+    steps = np.maximum(largest / 32767.0, 1e-12).astype('<f4')
+    parts.append(steps[channel_stored].tobytes())
+    # Transposed so the offsets come out component by component
+    component_steps = steps[:, _POSE_COMPONENT_CHANNELS]
+    quantized = offsets.T[stored.T] / component_steps.T[stored.T]
+    parts.append(np.clip(np.rint(quantized), -32767, 32767).astype('<i2').tobytes())
+    return base64.b64encode(b''.join(parts)).decode('ascii')
+
+def _decode_pose(blob):
+    """Unpack the base64 text stored on a button"""
+    data = base64.b64decode(blob)
+    version = data[:4]
+    if version not in (_POSE_MAGIC, _POSE_MAGIC_V2, _POSE_MAGIC_V1):
+        raise ValueError("Unknown pose format")
+    count = struct.unpack_from('<I', data, 4)[0]
+    offset = 8
+    flags = 0
+    if version != _POSE_MAGIC_V1:
+        flags = data[offset]
+        offset += 1
+    names = []
+    for i in range(count):
+        length = struct.unpack_from('<H', data, offset)[0]
+        names.append(data[offset + 2:offset + 2 + length].decode('utf-8'))
+        offset += 2 + length
+    modes = np.frombuffer(data, dtype=np.uint8, count=count, offset=offset)
+    offset += count
+    if version == _POSE_MAGIC_V1:
+        channels = np.full(count, _POSE_ALL_CHANNELS, dtype=np.uint8)
+    else:
+        channels = np.frombuffer(data, dtype=np.uint8, count=count, offset=offset)
+        offset += count
+    
+    # Channels and components that were not stored start out at rest
+    if version == _POSE_MAGIC:
+        components = np.frombuffer(data, dtype='<u2', count=count, offset=offset)
+        offset += count * 2
+        stored = ((components[None, :] >> np.arange(10, dtype=np.uint16)[:, None]) & 1).astype(bool)
+        channel_stored = np.logical_or.reduceat(stored.T, _POSE_CHANNEL_STARTS, axis=1)
+        steps = np.zeros((count, 3), dtype=np.float32)
+        steps[channel_stored] = np.frombuffer(data, dtype='<f4', count=int(np.count_nonzero(channel_stored)), offset=offset)
+        offset += int(np.count_nonzero(channel_stored)) * 4
+        quantized = np.frombuffer(data, dtype='<i2', count=int(np.count_nonzero(stored)), offset=offset)
+        values = _rest_components(modes).T.copy()
+        values[stored] += quantized * steps[:, _POSE_COMPONENT_CHANNELS].T[stored]
+        arrays = [values[0:3].T.copy(), values[3:7].T.copy(), values[7:10].T.copy()]
+    else:
+        arrays = [np.zeros((count, 3), dtype=np.float32), _rest_rotation(modes), np.ones((count, 3), dtype=np.float32)]
+        for values, channel in zip(arrays, (_POSE_LOCATION, _POSE_ROTATION, _POSE_SCALE)):
+            rows = (channels & channel) != 0
+            width = values.shape[1]
+            stored = int(np.count_nonzero(rows))
+            values[rows] = np.frombuffer(data, dtype='<f4', count=stored * width, offset=offset).reshape(stored, width)
+            offset += stored * width * 4
+    
+    partial = bool(flags & _POSE_PARTIAL)
+    if not partial:
+        # A full pose sets every channel, the ones left out to rest
+        channels = np.full(count, _POSE_ALL_CHANNELS, dtype=np.uint8)
+    return _Pose(tuple(names), modes, *arrays, channels=channels, partial=partial)
+
+def _pose_from_json(text):
+    """Convert the JSON pose data older versions stored on buttons"""
+    import json
+    
+    pose_data = json.loads(text)
+    count = len(pose_data)
+    modes = np.zeros(count, dtype=np.uint8)
+    location = np.zeros((count, 3), dtype=np.float32)
+    rotation = np.zeros((count, 4), dtype=np.float32)
+    scale = np.ones((count, 3), dtype=np.float32)
+    for i, transforms in enumerate(pose_data.values()):
+        # Axis angle bones were saved with their (unused) euler values
+        mode = transforms['rotation_mode'] if transforms['rotation_mode'] in _ROTATION_MODES[:-1] else 'XYZ'
+        modes[i] = _ROTATION_MODES.index(mode)
+        location[i] = transforms['location']
+        scale[i] = transforms['scale']
+        if mode == 'QUATERNION':
+            rotation[i] = transforms['rotation_quaternion'] or (1.0, 0.0, 0.0, 0.0)
+        elif transforms['rotation_euler']:
+            rotation[i, :3] = transforms['rotation_euler']
+    return _Pose(tuple(pose_data.keys()), modes, location, rotation, scale)
+
+def _euler_to_quaternion(euler, order):
+    """Convert (n, 3) eulers of one rotation order to (n, 4) quaternions"""
+    half = np.asarray(euler, dtype=np.float64) * 0.5
+    result = np.zeros((len(half), 4))
+    result[:, 0] = 1.0
+    # Rotations apply in the order's axis order: XYZ is Z * Y * X
+    for axis in (ord(c) - ord('X') for c in order):
+        q = np.zeros((len(half), 4))
+        q[:, 0] = np.cos(half[:, axis])
+        q[:, 1 + axis] = np.sin(half[:, axis])
+        result = _quaternion_multiply(q, result)
+    return result
+
+def _quaternion_multiply(a, b):
+    aw, ax, ay, az = a.T
+    bw, bx, by, bz = b.T
+    return np.stack((
+        aw * bw - ax * bx - ay * by - az * bz,
+        aw * bx + ax * bw + ay * bz - az * by,
+        aw * by - ax * bz + ay * bw + az * bx,
+        aw * bz + ax * by - ay * bx + az * bw,
+    ), axis=1)
+
+def _quaternion_to_matrix(quaternion):
+    q = np.asarray(quaternion, dtype=np.float64)
+    q = q / np.maximum(np.linalg.norm(q, axis=1, keepdims=True), 1e-12)
+    w, x, y, z = q.T
+    return np.stack((
+        np.stack((1 - 2 * (y * y + z * z), 2 * (x * y - w * z), 2 * (x * z + w * y)), axis=1),
+        np.stack((2 * (x * y + w * z), 1 - 2 * (x * x + z * z), 2 * (y * z - w * x)), axis=1),
+        np.stack((2 * (x * z - w * y), 2 * (y * z + w * x), 1 - 2 * (x * x + y * y)), axis=1),
+    ), axis=1)
+
+def _quaternion_to_euler(quaternion, order):
+    """Convert (n, 4) quaternions to (n, 3) eulers of one rotation order"""
+    a, b, c = (ord(ch) - ord('X') for ch in order)
+    # Even permutations of XYZ keep the signs, odd ones flip them
+    sign = 1.0 if (a, b, c) in ((0, 1, 2), (1, 2, 0), (2, 0, 1)) else -1.0
+    m = _quaternion_to_matrix(quaternion)
+    euler = np.empty((len(m), 3))
+    euler[:, b] = np.arcsin(np.clip(-sign * m[:, c, a], -1.0, 1.0))
+    euler[:, a] = np.arctan2(sign * m[:, c, b], m[:, c, c])
+    euler[:, c] = np.arctan2(sign * m[:, b, a], m[:, a, a])
+    return euler
+
+def _axis_angle_to_quaternion(axis_angle):
+    axis_angle = np.asarray(axis_angle, dtype=np.float64)
+    axis = axis_angle[:, 1:]
+    axis = axis / np.maximum(np.linalg.norm(axis, axis=1, keepdims=True), 1e-12)
+    half = axis_angle[:, 0] * 0.5
+    return np.concatenate((np.cos(half)[:, None], axis * np.sin(half)[:, None]), axis=1)
+
+def _quaternion_to_axis_angle(quaternion):
+    q = np.asarray(quaternion, dtype=np.float64)
+    q = q / np.maximum(np.linalg.norm(q, axis=1, keepdims=True), 1e-12)
+    angle = 2.0 * np.arccos(np.clip(q[:, 0], -1.0, 1.0))
+    sin_half = np.sqrt(np.maximum(1.0 - q[:, 0] * q[:, 0], 0.0))
+    # Blender's default axis for a zero rotation is +Y
+    axis = np.where(sin_half[:, None] > 1e-8, q[:, 1:] / np.maximum(sin_half, 1e-8)[:, None], (0.0, 1.0, 0.0))
+    return np.concatenate((angle[:, None], axis), axis=1)
+
+def _rotation_to_quaternion(rotation, modes):
+    """Convert stored rotations of mixed modes to (n, 4) quaternions, grouped by mode"""
+    result = np.empty((len(rotation), 4))
+    for mode_index in np.unique(modes):
+        rows = modes == mode_index
+        mode = _ROTATION_MODES[mode_index]
+        if mode == 'QUATERNION':
+            result[rows] = rotation[rows]
+        elif mode == 'AXIS_ANGLE':
+            result[rows] = _axis_angle_to_quaternion(rotation[rows])
+        else:
+            result[rows] = _euler_to_quaternion(rotation[rows, :3], mode)
+    return result
+
+def _read_pose_arrays(bones):
+    """Location, rotations and scale of every pose bone as (n, k) float32 arrays"""
+    count = len(bones)
+    arrays = {}
+    for attribute, width in (("location", 3), ("rotation_quaternion", 4), ("rotation_euler", 3),
+                             ("rotation_axis_angle", 4), ("scale", 3)):
+        values = np.empty(count * width, dtype=np.float32)
+        bones.foreach_get(attribute, values)
+        arrays[attribute] = values.reshape(count, width)
+    return arrays
+
+def _rest_pose_arrays(count):
+    """Arrays like _read_pose_arrays for an armature in its rest pose"""
+    arrays = {
+        "location": np.zeros((count, 3), dtype=np.float32),
+        "rotation_quaternion": np.zeros((count, 4), dtype=np.float32),
+        "rotation_euler": np.zeros((count, 3), dtype=np.float32),
+        "rotation_axis_angle": np.zeros((count, 4), dtype=np.float32),
+        "scale": np.ones((count, 3), dtype=np.float32),
+    }
+    arrays["rotation_quaternion"][:, 0] = 1.0
+    arrays["rotation_axis_angle"][:, 2] = 1.0
+    return arrays
+
+def _pose_rotation_rows(arrays, indices, modes):
+    """(n, 4) rotations of the bones at indices in the stored layout of their modes"""
+    rotation = np.zeros((len(indices), 4), dtype=np.float32)
+    quaternion = modes == _ROTATION_MODES.index('QUATERNION')
+    axis_angle = modes == _ROTATION_MODES.index('AXIS_ANGLE')
+    euler = ~(quaternion | axis_angle)
+    rotation[quaternion] = arrays["rotation_quaternion"][indices[quaternion]]
+    rotation[axis_angle] = arrays["rotation_axis_angle"][indices[axis_angle]]
+    rotation[euler, :3] = arrays["rotation_euler"][indices[euler]]
+    return rotation
+
+def _write_pose_arrays(bones, arrays):
+    for attribute, values in arrays.items():
+        bones.foreach_set(attribute, np.ascontiguousarray(values, dtype=np.float32).ravel())
+
+def _pose_apply_mask(context, obj, channels, selected_only=False):
+    """Channel mask to apply a pose with, see _patch_pose_arrays
+    
+    channels is a set of _POSE_CHANNEL_ITEMS names. Limited to the selected
+    bones it becomes one mask per pose bone, zero for unselected ones.
+    """
+    mask = 0
+    for channel in channels:
+        mask |= _POSE_CHANNEL_BITS[channel]
+    if not selected_only:
+        return mask
+    bone_indices = _bone_index_map(obj, 'POSE')
+    masks = np.zeros(len(obj.pose.bones), dtype=np.uint8)
+    selected = [bone_indices[name] for name in _get_selected_bone_names(context, obj) if name in bone_indices]
+    masks[np.array(selected, dtype=np.int64)] = mask
+    return masks
+
+def _patch_pose_arrays(obj, pose, arrays, mask=_POSE_ALL_CHANNELS):
+    """Write a pose into arrays from _read_pose_arrays
+    
+    Returns (indices of the posed bones, their channel masks). Only the
+    channels in both the pose's masks and mask are written, mask is one
+    channel mask or an array of one per pose bone. Bones keep their
+    rotation mode, stored rotations in another mode are converted in bulk.
+    """
+    bones = obj.pose.bones
+    bone_indices = _bone_index_map(obj, 'POSE')
+    rows = []
+    targets = []
+    for row, bone_name in enumerate(pose.names):
+        index = bone_indices.get(bone_name)
+        if index is not None:
+            rows.append(row)
+            targets.append(index)
+    rows = np.array(rows, dtype=np.int64)
+    targets = np.array(targets, dtype=np.int64)
+    channels = np.asarray(pose.channels, dtype=np.uint8)[rows]
+    # Masking is one array operation, partial applies cost the same as full ones
+    channels &= np.asarray(mask, dtype=np.uint8)[targets] if np.ndim(mask) else np.uint8(mask)
+    kept = channels != 0
+    rows, targets, channels = rows[kept], targets[kept], channels[kept]
+    if not len(rows):
+        return targets, channels
+    
+    masked = (channels & _POSE_LOCATION) != 0
+    arrays["location"][targets[masked]] = pose.location[rows[masked]]
+    masked = (channels & _POSE_SCALE) != 0
+    arrays["scale"][targets[masked]] = pose.scale[rows[masked]]
+    
+    masked = (channels & _POSE_ROTATION) != 0
+    if not masked.any():
+        return targets, channels
+    rows = rows[masked]
+    rotation_targets = targets[masked]
+    # Rotation mode is an enum, foreach_get can't read it
+    bone_modes = np.array([_ROTATION_MODES.index(bones[index].rotation_mode) for index in rotation_targets], dtype=np.uint8)
+    stored_modes = pose.modes[rows]
+    stored_rotation = pose.rotation[rows]
+    same_mode = bone_modes == stored_modes
+    
+    for mode_index in np.unique(bone_modes):
+        in_mode = bone_modes == mode_index
+        # Rotations already in the bone's mode are copied as they are
+        copy = in_mode & same_mode
+        convert = in_mode & ~same_mode
+        quaternion = _rotation_to_quaternion(stored_rotation[convert], stored_modes[convert]) if convert.any() else None
+        
+        mode = _ROTATION_MODES[mode_index]
+        if mode == 'QUATERNION':
+            values = arrays["rotation_quaternion"]
+            values[rotation_targets[copy]] = stored_rotation[copy]
+            if quaternion is not None:
+                values[rotation_targets[convert]] = quaternion
+        elif mode == 'AXIS_ANGLE':
+            values = arrays["rotation_axis_angle"]
+            values[rotation_targets[copy]] = stored_rotation[copy]
+            if quaternion is not None:
+                values[rotation_targets[convert]] = _quaternion_to_axis_angle(quaternion)
+        else:
+            values = arrays["rotation_euler"]
+            values[rotation_targets[copy]] = stored_rotation[copy, :3]
+            if quaternion is not None:
+                values[rotation_targets[convert]] = _quaternion_to_euler(quaternion, mode)
+    return targets, channels
+
+def _apply_pose(obj, pose, mask=_POSE_ALL_CHANNELS):
+    """Write a pose to an armature with a few bulk calls
+    
+    Returns (indices of the posed bones, their channel masks).
+    """
+    arrays = _read_pose_arrays(obj.pose.bones)
+    targets, channels = _patch_pose_arrays(obj, pose, arrays, mask)
+    if len(targets):
+        _write_pose_arrays(obj.pose.bones, arrays)
+        # foreach_set skips the property updates, re-evaluate the pose once
+        obj.update_tag(refresh={'DATA'})
+    return targets, channels
+
+def _get_action_fcurves(obj):
+    """(F-curves, groups) the object's animation is keyed into, creating the action if needed"""
+    anim = obj.animation_data or obj.animation_data_create()
+    action = anim.action
+    if action is None:
+        action = bpy.data.actions.new(f"{obj.name}Action")
+        anim.action = action
+    
+    # Blender 4.4+ layered actions keep F-curves in a channelbag per slot
+    if hasattr(action, 'layers') and hasattr(anim, 'action_slot'):
+        from bpy_extras import anim_utils
+        if anim.action_slot is None:
+            anim.action_slot = action.slots.new(id_type='OBJECT', name=obj.name)
+        channelbag = anim_utils.action_ensure_channelbag_for_slot(action, anim.action_slot)
+        return channelbag.fcurves, channelbag.groups
+    return action.fcurves, action.groups
+
+def _insert_pose_keys(context, obj, bone_indices, masks=None):
+    """Key the transforms of posed bones on the current frame, returns the number of keys set
+    
+    masks optionally limits each bone to the channels in its channel mask.
+    Writes straight into the action's F-curves, one bulk write per curve,
+    and follows the scene's keying settings like keying in the UI does.
+    """
+    if not len(bone_indices):
+        return 0
+    
+    scene = context.scene
+    tool_settings = scene.tool_settings
+    edit = context.preferences.edit
+    only_available = getattr(edit, 'use_keyframe_insert_available', False)
+    only_needed = getattr(edit, 'use_keyframe_insert_needed', False)
+    # The active keying set can override the "only needed" flag
+    keying_set = scene.keying_sets_all.active
+    if keying_set is not None and getattr(keying_set, 'use_insertkey_override_needed', False):
+        only_needed = keying_set.use_insertkey_needed
+    frame = float(scene.frame_current)
+    
+    # Keyframe enums as the integer values foreach_set writes
+    properties = bpy.types.Keyframe.bl_rna.properties
+    handle_type = properties['handle_left_type'].enum_items[edit.keyframe_new_handle_type].value
+    new_values = (
+        ("interpolation", properties['interpolation'].enum_items[edit.keyframe_new_interpolation_type].value),
+        ("handle_left_type", handle_type),
+        ("handle_right_type", handle_type),
+    )
+    keyframe_type = properties['type'].enum_items[tool_settings.keyframe_type].value
+    
+    # Channels to key: (data path, array index, group, value)
+    bones = obj.pose.bones
+    arrays = _read_pose_arrays(bones)
+    channels = []
+    for i, index in enumerate(bone_indices):
+        bone = bones[index]
+        mask = _POSE_ALL_CHANNELS if masks is None else int(masks[i])
+        rotation = {'QUATERNION': "rotation_quaternion", 'AXIS_ANGLE': "rotation_axis_angle"}.get(bone.rotation_mode, "rotation_euler")
+        prefix = f'pose.bones["{bpy.utils.escape_identifier(bone.name)}"].'
+        for attribute, channel in (("location", _POSE_LOCATION), (rotation, _POSE_ROTATION), ("scale", _POSE_SCALE)):
+            if not mask & channel:
+                continue
+            for array_index, value in enumerate(arrays[attribute][index]):
+                channels.append((prefix + attribute, array_index, bone.name, float(value)))
+    
+    fcurves, groups = _get_action_fcurves(obj)
+    existing = {(fcurve.data_path, fcurve.array_index): fcurve for fcurve in fcurves}
+    
+    # Create the missing F-curves in one pass, grouped by bone like Blender does
+    if not only_available:
+        for data_path, array_index, group_name, value in channels:
+            if (data_path, array_index) in existing:
+                continue
+            fcurve = fcurves.new(data_path, index=array_index)
+            try:
+                fcurve.group = groups.get(group_name) or groups.new(group_name)
+            except:
+                pass
+            existing[(data_path, array_index)] = fcurve
+    
+    # Group the values per F-curve, a curve gets at most one key on this frame
+    curve_values = {}
+    for data_path, array_index, group_name, value in channels:
+        fcurve = existing.get((data_path, array_index))
+        if fcurve is not None:
+            curve_values[fcurve] = value
+    
+    keyed = 0
+    for fcurve, value in curve_values.items():
+        points = fcurve.keyframe_points
+        count = len(points)
+        if only_needed and count and abs(fcurve.evaluate(frame) - value) < 1e-6:
+            continue
+        
+        co = np.empty(count * 2, dtype=np.float32)
+        points.foreach_get("co", co)
+        on_frame = np.flatnonzero(np.abs(co[0::2] - frame) < 1e-4)
+        if len(on_frame):
+            # Replace the key already on this frame, its handles move with it
+            index = int(on_frame[0])
+            offset = value - co[index * 2 + 1]
+            handles = (("handle_left", None), ("handle_right", None))
+            attributes = (("type", keyframe_type),)
+        else:
+            # Append the new key, update() sorts it into place
+            index = count
+            count += 1
+            points.add(1)
+            co = np.append(co, (frame, value)).astype(np.float32)
+            # One frame either side like keys inserted by Blender, update() only
+            # recalculates automatic and vector handles
+            handles = (("handle_left", (frame - 1.0, value)), ("handle_right", (frame + 1.0, value)))
+            attributes = new_values + (("type", keyframe_type),)
+        co[index * 2 + 1] = value
+        points.foreach_set("co", co)
+        for attribute, handle in handles:
+            positions = np.empty(count * 2, dtype=np.float32)
+            points.foreach_get(attribute, positions)
+            if handle is None:
+                positions[index * 2 + 1] += offset
+            else:
+                positions[index * 2:index * 2 + 2] = handle
+            points.foreach_set(attribute, positions)
+        for attribute, attribute_value in attributes:
+            values = np.empty(count, dtype=np.int32)
+            points.foreach_get(attribute, values)
+            values[index] = attribute_value
+            points.foreach_set(attribute, values)
+        # Sorts the keys and recalculates handles once per curve
+        fcurve.update()
+        keyed += 1
+    return keyed
+
+def _slerp(a, b, factor):
+    """Spherical interpolation between two (n, 4) quaternion arrays"""
+    a = np.asarray(a, dtype=np.float64)
+    b = np.asarray(b, dtype=np.float64)
+    dot = np.sum(a * b, axis=1)
+    # Take the short way round
+    b = np.where(dot[:, None] < 0.0, -b, b)
+    dot = np.clip(np.abs(dot), 0.0, 1.0)
+    theta = np.arccos(dot)
+    sin_theta = np.sin(theta)
+    nearly_equal = sin_theta < 1e-6
+    safe_sin = np.where(nearly_equal, 1.0, sin_theta)
+    weight_a = np.where(nearly_equal, 1.0 - factor, np.sin((1.0 - factor) * theta) / safe_sin)
+    weight_b = np.where(nearly_equal, factor, np.sin(factor * theta) / safe_sin)
+    result = weight_a[:, None] * a + weight_b[:, None] * b
+    return result / np.maximum(np.linalg.norm(result, axis=1, keepdims=True), 1e-12)
+
+class _PoseBlend:
+    """Mix between the pose an armature had and a saved pose"""
+    
+    def __init__(self, obj, pose, mask=_POSE_ALL_CHANNELS):
+        self.obj = obj
+        self.start = _read_pose_arrays(obj.pose.bones)
+        self.target = {attribute: values.copy() for attribute, values in self.start.items()}
+        self.bones, self.channels = _patch_pose_arrays(obj, pose, self.target, mask)
+        self.result = {attribute: values.copy() for attribute, values in self.start.items()}
+        self.factor = 0.0
+    
+    def evaluate(self, factor):
+        """Write the mix for a factor between 0 (start) and 1 (saved pose)"""
+        self.factor = factor
+        bones = self.bones
+        for attribute, start in self.start.items():
+            target = self.target[attribute]
+            if attribute == "rotation_quaternion":
+                # Quaternions are slerped, everything else is mixed linearly
+                self.result[attribute][bones] = _slerp(start[bones], target[bones], factor)
+            else:
+                self.result[attribute][bones] = start[bones] + (target[bones] - start[bones]) * factor
+        _write_pose_arrays(self.obj.pose.bones, self.result)
+        self.obj.update_tag(refresh={'DATA'})
+    
+    def restore(self):
+        _write_pose_arrays(self.obj.pose.bones, self.start)
+        self.obj.update_tag(refresh={'DATA'})
+
+# Left/right naming: .L/.R, _l/_r, L_/R_ and similar, or Left/Right anywhere
+_SIDE_SUFFIX = re.compile(r'^(.*[._\- ])([LlRr])((?:\.\d+)?)$')
+_SIDE_PREFIX = re.compile(r'^([LlRr])([._\- ].*)$')
+_SIDE_WORD = re.compile(r'Left|Right|left|right|LEFT|RIGHT')
+_SIDE_SWAP = {'L': 'R', 'R': 'L', 'l': 'r', 'r': 'l',
+              'Left': 'Right', 'Right': 'Left', 'left': 'right', 'right': 'left',
+              'LEFT': 'RIGHT', 'RIGHT': 'LEFT'}
+
+def _mirror_bone_name(name):
+    """Name of the bone on the other side, the name itself for center bones"""
+    match = _SIDE_SUFFIX.match(name)
+    if match:
+        return match.group(1) + _SIDE_SWAP[match.group(2)] + match.group(3)
+    match = _SIDE_PREFIX.match(name)
+    if match:
+        return _SIDE_SWAP[match.group(1)] + match.group(2)
+    return _SIDE_WORD.sub(lambda word: _SIDE_SWAP[word.group(0)], name, count=1)
+
+# Left/right bone pairs per armature
+# Key: armature pointer -> (bone names the map was built from, {name: mirrored name})
+_symmetry_maps = {}
+
+def _symmetry_map(obj):
+    """Bone name -> name of its mirrored counterpart, for bones that have one"""
+    _bone_index_map(obj, 'DATA')
+    names = _bone_indices[(obj.data.as_pointer(), 'DATA')][0]
+    entry = _symmetry_maps.get(obj.data.as_pointer())
+    # Rebuilt only when the bones were renamed, added or removed
+    if entry is None or entry[0] is not names:
+        existing = set(names)
+        pairs = {}
+        for name in names:
+            mirrored = _mirror_bone_name(name)
+            if mirrored != name and mirrored in existing:
+                pairs[name] = mirrored
+        entry = (names, pairs)
+        _symmetry_maps[obj.data.as_pointer()] = entry
+    return entry[1]
+
+def _mirror_pose(obj, pose):
+    """The pose flipped across the rig's X axis, with left and right bones swapped"""
+    pairs = _symmetry_map(obj)
+    names = tuple(pairs.get(name, name) for name in pose.names)
+    
+    location = pose.location.copy()
+    location[:, 0] *= -1.0
+    
+    # Quaternions become (w, x, -y, -z), axis angles (angle, x, -y, -z), eulers (x, -y, -z)
+    rotation = pose.rotation.copy()
+    is_euler = (pose.modes != _ROTATION_MODES.index('QUATERNION')) & (pose.modes != _ROTATION_MODES.index('AXIS_ANGLE'))
+    rotation[~is_euler, 2:4] *= -1.0
+    rotation[is_euler, 1:3] *= -1.0
+    return _Pose(names, pose.modes, location, rotation, pose.scale, pose.channels, pose.partial)
+
+# Decoded poses of pose buttons
+# Key: button pointer -> (pose blob, _Pose)
+_pose_cache = {}
+
+def _get_button_pose(item, migrate=True):
+    """The decoded pose of a pose button, None if it has none
+    
+    Buttons still holding JSON pose data or an older binary format are
+    converted to the current format on first use when migrate is set (not
+    allowed while drawing).
+    """
+    if item.library_pose:
+        return _get_library_pose(item.library_rig, item.library_pose)
+    if not item.pose_blob:
+        if not item.pose_data:
+            return None
+        pose = _pose_from_json(item.pose_data)
+        if migrate:
+            item.pose_blob = _encode_pose(pose)
+            item.pose_data = ""
+            _pose_cache[item.as_pointer()] = (item.pose_blob, pose)
+        return pose
+    
+    blob = item.pose_blob
+    entry = _pose_cache.get(item.as_pointer())
+    if entry is None or entry[0] != blob:
+        _prune_pose_cache(item.id_data.bone_picker_buttons)
+        pose = _decode_pose(blob)
+        # Older binary poses are rewritten in the compact format
+        if migrate and base64.b64decode(blob[:8])[:4] != _POSE_MAGIC:
+            item.pose_blob = blob = _encode_pose(pose)
+        entry = (blob, pose)
+        _pose_cache[item.as_pointer()] = entry
+    return entry[1]
+
+def _prune_pose_cache(buttons):
+    """Drop decoded poses of buttons that were removed"""
+    if len(_pose_cache) < len(buttons):
+        return
+    alive = {btn.as_pointer() for btn in buttons}
+    for key in [key for key in _pose_cache if key not in alive]:
+        del _pose_cache[key]
+
+# Shared pose library
+# Poses live in a SQLite file outside the .blend, keyed by rig (armature
+# data name) and pose name. Buttons only hold the key, pose data and
+# thumbnails are read the first time a button is clicked or drawn.
+_LIBRARY_SCHEMA = """
+CREATE TABLE IF NOT EXISTS poses (
+    rig TEXT NOT NULL,
+    name TEXT NOT NULL,
+    pose BLOB NOT NULL,
+    thumbnail BLOB,
+    modified REAL NOT NULL,
+    PRIMARY KEY (rig, name)
+);
+CREATE TABLE IF NOT EXISTS pose_tags (
+    rig TEXT NOT NULL,
+    name TEXT NOT NULL,
+    tag TEXT NOT NULL,
+    PRIMARY KEY (rig, name, tag),
+    FOREIGN KEY (rig, name) REFERENCES poses (rig, name) ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS pose_tags_by_tag ON pose_tags (tag, rig);
+"""
+_LIBRARY_THUMBNAIL_SIZE = 128
+
+_library_connection = None
+_library_connection_path = None
+# Key: (rig, pose name) -> (modified time, _Pose)
+_library_poses = {}
+# Key: (rig, pose name) -> (GPU texture, width, height), None when there is no thumbnail
+_library_thumbnails = {}
+
+def _library_path():
+    """Pose library file from the add-on preferences, or one in the user's data folder"""
+    addon = bpy.context.preferences.addons.get(__name__)
+    path = addon.preferences.pose_library_path if addon else ""
+    if not path:
+        folder = bpy.utils.user_resource('DATAFILES', path="bone_picker", create=True)
+        path = os.path.join(folder, "pose_library.db")
+    return bpy.path.abspath(path)
+
+def _get_library():
+    """Open connection to the pose library, the file is created on first use"""
+    global _library_connection, _library_connection_path
+    path = _library_path()
+    if _library_connection is None or _library_connection_path != path:
+        _close_library()
+        connection = sqlite3.connect(path)
+        connection.execute("PRAGMA foreign_keys = ON")
+        connection.executescript(_LIBRARY_SCHEMA)
+        _library_connection = connection
+        _library_connection_path = path
+    return _library_connection
+
+def _close_library():
+    """Close the pose library and forget everything read from it"""
+    global _library_connection, _library_connection_path
+    if _library_connection is not None:
+        try:
+            _library_connection.close()
+        except:
+            pass
+    _library_connection = None
+    _library_connection_path = None
+    _library_poses.clear()
+    _library_thumbnails.clear()
+
+def _get_library_pose(rig, name):
+    """The decoded library pose, None if the library has no such pose"""
+    library = _get_library()
+    row = library.execute("SELECT modified FROM poses WHERE rig = ? AND name = ?", (rig, name)).fetchone()
+    if row is None:
+        _library_poses.pop((rig, name), None)
+        return None
+    entry = _library_poses.get((rig, name))
+    # Decoded again only when the pose was stored again since
+    if entry is None or entry[0] != row[0]:
+        modified, data = library.execute(
+            "SELECT modified, pose FROM poses WHERE rig = ? AND name = ?", (rig, name)).fetchone()
+        entry = (modified, _decode_pose(base64.b64encode(data)))
+        _library_poses[(rig, name)] = entry
+    return entry[1]
+
+def _store_library_pose(rig, name, pose, tags=(), thumbnail=None):
+    """Write a pose to the library, replacing one with the same rig and name"""
+    library = _get_library()
+    with library:
+        library.execute(
+            "INSERT OR REPLACE INTO poses (rig, name, pose, thumbnail, modified) VALUES (?, ?, ?, ?, ?)",
+            (rig, name, base64.b64decode(_encode_pose(pose)), thumbnail, time.time()))
+        library.execute("DELETE FROM pose_tags WHERE rig = ? AND name = ?", (rig, name))
+        library.executemany("INSERT OR IGNORE INTO pose_tags (rig, name, tag) VALUES (?, ?, ?)",
+                            [(rig, name, tag) for tag in tags])
+    _library_poses.pop((rig, name), None)
+    _library_thumbnails.pop((rig, name), None)
+    _tag_poses_changed()
+
+def _find_library_poses(rig, tag=""):
+    """Names of the library poses of a rig, optionally only the ones with a tag"""
+    library = _get_library()
+    if tag:
+        rows = library.execute("SELECT name FROM pose_tags WHERE tag = ? AND rig = ? ORDER BY name", (tag, rig))
+    else:
+        rows = library.execute("SELECT name FROM poses WHERE rig = ? ORDER BY name", (rig,))
+    return [row[0] for row in rows]
+
+def _parse_tags(text):
+    return sorted({tag.strip().lower() for tag in text.split(",") if tag.strip()})
+
+# Pose buttons packed into matrices for the nearest pose search
+# Key: armature pointer -> (cache key, _PoseMatrix)
+_pose_matrices = {}
+# Buttons found by the last nearest pose search
+# Key: button index -> rank, 0 is the closest
+# Indices only hold until buttons are removed or reordered, so the matches
+# are dropped once the order revision moves on
+_pose_matches = {}
+_pose_matches_key = None
+
+def _get_pose_matches(buttons):
+    """Ranks of the last nearest pose search by button index, empty once the buttons changed"""
+    if _pose_matches and _pose_matches_key != (_order_revision, buttons.id_data.as_pointer()):
+        _pose_matches.clear()
+    return _pose_matches
+
+def _set_pose_matches(buttons, ranks):
+    global _pose_matches_key
+    _pose_matches.clear()
+    _pose_matches.update(ranks)
+    _pose_matches_key = (_order_revision, buttons.id_data.as_pointer())
+    _tag_canvas_dirty()
+
+class _PoseMatrix:
+    """Every pose button of a scene laid out over the bones of one rig
+    
+    Only the bones some pose sets get a column. location (p, b, 3) and
+    quaternion (p, b, 4) hold the stored transforms, location_mask and
+    rotation_mask (p, b) which of them the pose sets.
+    """
+    
+    def __init__(self, obj, buttons):
+        bone_indices = _bone_index_map(obj, 'POSE')
+        entries = []
+        for index, btn in enumerate(buttons):
+            if not btn.is_pose:
+                continue
+            try:
+                # Migrating would bump the pose revision and outdate this matrix
+                pose = _get_button_pose(btn, migrate=False)
+            except:
+                pose = None
+            if pose is None:
+                continue
+            rows = [row for row, name in enumerate(pose.names) if name in bone_indices]
+            if rows:
+                rows = np.array(rows, dtype=np.int64)
+                targets = np.array([bone_indices[pose.names[row]] for row in rows], dtype=np.int64)
+                entries.append((index, pose, rows, targets))
+        
+        self.buttons = np.array([entry[0] for entry in entries], dtype=np.int64)
+        self.bones = np.unique(np.concatenate([entry[3] for entry in entries])) if entries else np.zeros(0, dtype=np.int64)
+        # Bone index -> column
+        columns = np.full(len(obj.pose.bones), -1, dtype=np.int64)
+        columns[self.bones] = np.arange(len(self.bones))
+        
+        count, width = len(entries), len(self.bones)
+        self.location = np.zeros((count, width, 3), dtype=np.float32)
+        self.quaternion = np.zeros((count, width, 4), dtype=np.float32)
+        self.quaternion[:, :, 0] = 1.0
+        self.location_mask = np.zeros((count, width), dtype=bool)
+        self.rotation_mask = np.zeros((count, width), dtype=bool)
+        for i, (index, pose, rows, targets) in enumerate(entries):
+            channels = np.asarray(pose.channels)[rows]
+            cols = columns[targets]
+            self.location[i, cols] = pose.location[rows]
+            quaternion = _rotation_to_quaternion(pose.rotation[rows], pose.modes[rows])
+            self.quaternion[i, cols] = quaternion / np.maximum(np.linalg.norm(quaternion, axis=1, keepdims=True), 1e-12)
+            self.location_mask[i, cols] = (channels & _POSE_LOCATION) != 0
+            self.rotation_mask[i, cols] = (channels & _POSE_ROTATION) != 0
+        
+        self.location_weight = self.location_mask.astype(np.float32)
+        self.rotation_weight = self.rotation_mask.astype(np.float32)
+        self.coverage = (self.location_mask | self.rotation_mask).astype(np.float32)
+    
+    def distances(self, location, quaternion, weights):
+        """Weighted mean distance of every pose to a pose of the whole armature
+        
+        Per bone the distance is the location offset plus the angle between
+        the rotations, weighted by bone length.
+        """
+        location = location[self.bones]
+        quaternion = quaternion[self.bones]
+        quaternion = quaternion / np.maximum(np.linalg.norm(quaternion, axis=1, keepdims=True), 1e-12)
+        weights = weights[self.bones]
+        location = location.astype(np.float32)
+        # Subtracted directly, expanding the square loses millimetres at large offsets
+        offset = np.linalg.norm(self.location - location, axis=2)
+        dot = np.abs(np.einsum('pbk,bk->pb', self.quaternion, quaternion.astype(np.float32)))
+        angle = 2.0 * np.arccos(np.minimum(dot, 1.0))
+        total = (offset * self.location_weight) @ weights + (angle * self.rotation_weight) @ weights
+        # Mean over the bones a pose sets, so small poses aren't favoured
+        return total / np.maximum(self.coverage @ weights, 1e-6)
+
+def _get_pose_matrix(obj, scene):
+    """The pose matrix of a rig, rebuilt only after pose buttons or bones changed"""
+    _bone_index_map(obj, 'POSE')
+    names = _bone_indices[(obj.data.as_pointer(), 'POSE')][0]
+    buttons = scene.bone_picker_buttons
+    key = (_pose_revision, len(buttons), scene.as_pointer(), names)
+    entry = _pose_matrices.get(obj.data.as_pointer())
+    if entry is None or entry[0][:3] != key[:3] or entry[0][3] is not names:
+        entry = (key, _PoseMatrix(obj, buttons))
+        _pose_matrices[obj.data.as_pointer()] = entry
+    return entry[1]
+
+def _current_pose_vectors(obj):
+    """(location (n, 3), quaternion (n, 4), bone length (n,)) of every pose bone"""
+    bones = obj.pose.bones
+    arrays = _read_pose_arrays(bones)
+    # Rotation mode is an enum, foreach_get can't read it
+    modes = np.array([_ROTATION_MODES.index(bone.rotation_mode) for bone in bones], dtype=np.uint8)
+    rotation = _pose_rotation_rows(arrays, np.arange(len(bones)), modes)
+    lengths = np.empty(len(bones), dtype=np.float32)
+    bones.foreach_get("length", lengths)
+    return arrays["location"], _rotation_to_quaternion(rotation, modes), lengths
 
 # Store button data
 class BonePickerButton(PropertyGroup):
     bone_name: StringProperty(
         name="Bone Name",
         description="Name of the bone to select",
-        default=""
+        default="",
+        update=_on_button_style_update
     )
     button_label: StringProperty(
         name="Button Label",
         description="Label shown on the button",
-        default=""
+        default="",
+        update=_on_button_style_update
     )
     pos_x: FloatProperty(
         name="X Position",
         description="X position of button in canvas",
-        default=0.0
+        default=0.0,
+        update=_on_button_layout_update
     )
     pos_y: FloatProperty(
         name="Y Position",
         description="Y position of button in canvas",
-        default=0.0
+        default=0.0,
+        update=_on_button_layout_update
     )
     width: FloatProperty(
         name="Width",
         description="Button width",
         default=100.0,
         min=10.0,
-        max=1000.0
+        max=1000.0,
+        update=_on_button_layout_update
     )
     height: FloatProperty(
         name="Height",
         description="Button height",
         default=50.0,
         min=10.0,
-        max=1000.0
+        max=1000.0,
+        update=_on_button_layout_update
     )
     is_empty: BoolProperty(
         name="Is Empty",
         description="Empty button for decoration only",
-        default=False
+        default=False,
+        update=_on_button_type_update
     )
     image_path: StringProperty(
         name="Image Path",
@@ -78,63 +1341,92 @@ class BonePickerButton(PropertyGroup):
     image_name: StringProperty(
         name="Image Name",
         description="Name of loaded image in Blender",
-        default=""
+        default="",
+        update=_on_button_style_update
     )
     is_circle: BoolProperty(
         name="Is Circle",
         description="Draw button as circle/dot instead of rectangle",
-        default=False
+        default=False,
+        update=_on_button_style_update
     )
     color_r: FloatProperty(
         name="Red",
         description="Button color - Red channel",
         default=0.2,
         min=0.0,
-        max=1.0
+        max=1.0,
+        update=_on_button_style_update
     )
     color_g: FloatProperty(
         name="Green",
         description="Button color - Green channel",
         default=0.3,
         min=0.0,
-        max=1.0
+        max=1.0,
+        update=_on_button_style_update
     )
     color_b: FloatProperty(
         name="Blue",
         description="Button color - Blue channel",
         default=0.5,
         min=0.0,
-        max=1.0
+        max=1.0,
+        update=_on_button_style_update
     )
     is_locked: BoolProperty(
         name="Is Locked",
         description="Lock button position (cannot be moved or resized)",
-        default=False
+        default=False,
+        update=_on_button_static_update
     )
     is_hidden: BoolProperty(
         name="Is Hidden",
         description="Hide button from canvas",
-        default=False
+        default=False,
+        update=_on_button_order_update
     )
     z_order: IntProperty(
         name="Z Order",
         description="Drawing order - higher values draw on top",
-        default=0
+        default=0,
+        update=_on_button_order_update
     )
     section: StringProperty(
         name="Section",
         description="Section/group name for organizing buttons (1-9)",
-        default="1"
+        default="1",
+        update=_on_button_section_update
     )
     is_pose: BoolProperty(
         name="Is Pose",
         description="This button applies a saved pose",
-        default=False
+        default=False,
+        update=_on_button_pose_update
     )
     pose_data: StringProperty(
         name="Pose Data",
-        description="JSON data storing bone transforms",
-        default=""
+        description="JSON data storing bone transforms (older versions, migrated to Pose Blob on use)",
+        default="",
+        update=_on_button_pose_update
+    )
+    pose_blob: StringProperty(
+        name="Pose Blob",
+        description="Base64 encoded binary pose data storing bone transforms",
+        default="",
+        update=_on_button_pose_update
+    )
+    library_rig: StringProperty(
+        name="Library Rig",
+        description="Rig of the pose library entry this button applies",
+        default="",
+        update=_on_button_pose_update
+    )
+    library_pose: StringProperty(
+        name="Library Pose",
+        description="Name of the pose library entry this button applies, the pose is read from the library on first use",
+        default="",
+        update=_on_button_pose_update
     )
 
 class BONEPICKER_OT_AddButton(Operator):
@@ -208,37 +1500,83 @@ class BONEPICKER_OT_AddEmptyButton(Operator):
         self.report({'INFO'}, "Added empty button")
         return {'FINISHED'}
 
+# Enum items have to stay referenced while Blender shows them
+_base_pose_items = []
+
+def _get_base_pose_items(self, context):
+    global _base_pose_items
+    items = [('REST', "Rest Pose", "Store the channels that differ from the rest pose")]
+    for i, btn in enumerate(context.scene.bone_picker_buttons):
+        if btn.is_pose and (btn.pose_blob or btn.pose_data or btn.library_pose):
+            items.append((str(i), btn.button_label, "Store only the channels that differ from this pose"))
+    _base_pose_items = items
+    return items
+
 class BONEPICKER_OT_SavePose(Operator):
     """Save current pose of selected bones"""
     bl_idname = "bonepicker.save_pose"
     bl_label = "Save Pose"
     
     pose_name: StringProperty(name="Pose Name", default="New Pose")
+    base_pose: EnumProperty(
+        name="Relative To",
+        description="Channels matching this pose are left out of the saved pose",
+        items=_get_base_pose_items
+    )
     
     def execute(self, context):
         if context.mode != 'POSE':
             self.report({'WARNING'}, "Must be in Pose Mode")
             return {'CANCELLED'}
         
-        if not context.selected_pose_bones:
-            self.report({'WARNING'}, "No bones selected")
+        obj = context.active_object
+        if not obj or obj.type != 'ARMATURE':
+            self.report({'WARNING'}, "No armature selected")
             return {'CANCELLED'}
         
-        import json
+        # Selected bones of the active armature as indices into its pose bones
+        selected = [bone for bone in (context.selected_pose_bones or ()) if bone.id_data == obj]
+        if not selected:
+            self.report({'WARNING'}, "No bones selected")
+            return {'CANCELLED'}
+        indices = np.array(_resolve_bone_indices(obj, [bone.name for bone in selected]), dtype=np.int64)
         
         # Get active section
         active_section = context.scene.bone_picker_active_section if hasattr(context.scene, 'bone_picker_active_section') else "1"
         
-        # Store pose data for selected bones
-        pose_data = {}
-        for bone in context.selected_pose_bones:
-            pose_data[bone.name] = {
-                'location': list(bone.location),
-                'rotation_quaternion': list(bone.rotation_quaternion) if bone.rotation_mode == 'QUATERNION' else None,
-                'rotation_euler': list(bone.rotation_euler) if bone.rotation_mode != 'QUATERNION' else None,
-                'rotation_mode': bone.rotation_mode,
-                'scale': list(bone.scale)
-            }
+        # Read the whole armature in bulk and slice out the selected bones
+        bones = obj.pose.bones
+        arrays = _read_pose_arrays(bones)
+        modes = np.array([_ROTATION_MODES.index(bone.rotation_mode) for bone in selected], dtype=np.uint8)
+        location = arrays["location"][indices]
+        rotation = _pose_rotation_rows(arrays, indices, modes)
+        scale = arrays["scale"][indices]
+        
+        # Compare against the rest pose, or the rest pose with the base pose applied
+        reference = _rest_pose_arrays(len(bones))
+        partial = self.base_pose != 'REST'
+        if partial:
+            base = _get_button_pose(context.scene.bone_picker_buttons[int(self.base_pose)])
+            if base is not None:
+                _patch_pose_arrays(obj, base, reference)
+        channels = np.zeros(len(indices), dtype=np.uint8)
+        for values, reference_values, channel in (
+                (location, reference["location"][indices], _POSE_LOCATION),
+                (rotation, _pose_rotation_rows(reference, indices, modes), _POSE_ROTATION),
+                (scale, reference["scale"][indices], _POSE_SCALE)):
+            changed = np.any(np.abs(values - reference_values) > _POSE_TOLERANCE, axis=1)
+            channels[changed] |= channel
+        
+        names = tuple(bone.name for bone in selected)
+        if partial:
+            # Bones matching the base pose are left out, applying leaves them alone
+            keep = channels != 0
+            if not keep.any():
+                self.report({'WARNING'}, "Selected bones match the base pose")
+                return {'CANCELLED'}
+            names = tuple(name for name, kept in zip(names, keep) if kept)
+            modes, location, rotation, scale, channels = modes[keep], location[keep], rotation[keep], scale[keep], channels[keep]
+        pose = _Pose(names, modes, location, rotation, scale, channels, partial)
         
         # Find highest z_order in active section
         max_z = 0
@@ -252,7 +1590,7 @@ class BONEPICKER_OT_SavePose(Operator):
         item.button_label = self.pose_name
         item.is_pose = True
         item.is_empty = False
-        item.pose_data = json.dumps(pose_data)
+        item.pose_blob = _encode_pose(pose)
         item.section = active_section
         item.z_order = max_z + 1
         # Green color for pose buttons
@@ -264,7 +1602,8 @@ class BONEPICKER_OT_SavePose(Operator):
         item.pos_x = (count % 4) * 120 + 50
         item.pos_y = (count // 4) * 70 + 50
         
-        self.report({'INFO'}, f"Saved pose: {self.pose_name} ({len(pose_data)} bones)")
+        stored = sum(int(np.count_nonzero(channels & channel)) for channel in (_POSE_LOCATION, _POSE_ROTATION, _POSE_SCALE))
+        self.report({'INFO'}, f"Saved pose: {self.pose_name} ({len(names)} bones, {stored} channels)")
         return {'FINISHED'}
     
     def invoke(self, context, event):
@@ -275,48 +1614,225 @@ class BONEPICKER_OT_ApplyPose(Operator):
     bl_idname = "bonepicker.apply_pose"
     bl_label = "Apply Pose"
     
+    button_index: IntProperty(default=-1)
     pose_data_json: StringProperty()
+    insert_keys: BoolProperty(
+        name="Insert Keyframes",
+        description="Key the posed bones on the current frame",
+        default=False
+    )
+    mirror: BoolProperty(
+        name="Mirror",
+        description="Apply the pose flipped across the X axis, left and right swapped",
+        default=False
+    )
+    channels: EnumProperty(
+        name="Channels",
+        description="Transform channels of the pose to apply",
+        items=_POSE_CHANNEL_ITEMS,
+        options={'ENUM_FLAG'},
+        default={'LOCATION', 'ROTATION', 'SCALE'}
+    )
+    selected_only: BoolProperty(
+        name="Selected Bones Only",
+        description="Only pose the bones that are selected",
+        default=False
+    )
     
     def execute(self, context):
         if context.mode != 'POSE':
             self.report({'WARNING'}, "Must be in Pose Mode")
             return {'CANCELLED'}
         
-        if not context.active_object or context.active_object.type != 'ARMATURE':
+        obj = context.active_object
+        if not obj or obj.type != 'ARMATURE':
             self.report({'WARNING'}, "No armature selected")
             return {'CANCELLED'}
         
-        import json
-        
         try:
-            pose_data = json.loads(self.pose_data_json)
+            # Poses of buttons come decoded from the cache, JSON is still accepted
+            if self.button_index >= 0:
+                pose = _get_button_pose(context.scene.bone_picker_buttons[self.button_index])
+            else:
+                pose = _pose_from_json(self.pose_data_json)
+            if pose is None:
+                self.report({'WARNING'}, "Button has no pose data")
+                return {'CANCELLED'}
+            if self.mirror:
+                pose = _mirror_pose(obj, pose)
             
-            applied_count = 0
-            for bone_name, transforms in pose_data.items():
-                if bone_name in context.active_object.pose.bones:
-                    bone = context.active_object.pose.bones[bone_name]
-                    
-                    # Apply transforms
-                    bone.location = transforms['location']
-                    bone.scale = transforms['scale']
-                    
-                    # Apply rotation based on mode
-                    if transforms['rotation_mode'] == 'QUATERNION' and transforms['rotation_quaternion']:
-                        bone.rotation_mode = 'QUATERNION'
-                        bone.rotation_quaternion = transforms['rotation_quaternion']
-                    elif transforms['rotation_euler']:
-                        bone.rotation_mode = transforms['rotation_mode']
-                        bone.rotation_euler = transforms['rotation_euler']
-                    
-                    applied_count += 1
+            mask = _pose_apply_mask(context, obj, self.channels, self.selected_only)
+            posed_bones, channels = _apply_pose(obj, pose, mask)
             
-            self.report({'INFO'}, f"Applied pose to {applied_count} bones")
+            if self.insert_keys:
+                keyed = _insert_pose_keys(context, obj, posed_bones, channels)
+                self.report({'INFO'}, f"Applied pose to {len(posed_bones)} bones, inserted {keyed} keys")
+            else:
+                self.report({'INFO'}, f"Applied pose to {len(posed_bones)} bones")
+            _tag_canvas_dirty()
         except Exception as e:
             self.report({'ERROR'}, f"Failed to apply pose: {str(e)}")
             return {'CANCELLED'}
         
         return {'FINISHED'}
 
+def _button_thumbnail(item):
+    """PNG thumbnail of a button's image for the pose library, None if it has none"""
+    image = bpy.data.images.get(item.image_name) if item.image_name else None
+    if image is None or not image.size[0] or not image.size[1]:
+        return None
+    width, height = image.size
+    pixels = np.empty(width * height * 4, dtype=np.float32)
+    image.pixels.foreach_get(pixels)
+    # Blender images start at the bottom row
+    pixels = np.flipud(pixels.reshape(height, width, 4))
+    thumbnail = Image.fromarray((np.clip(pixels, 0.0, 1.0) * 255.0 + 0.5).astype(np.uint8), 'RGBA')
+    thumbnail.thumbnail((_LIBRARY_THUMBNAIL_SIZE, _LIBRARY_THUMBNAIL_SIZE))
+    stream = io.BytesIO()
+    thumbnail.save(stream, format='PNG')
+    return stream.getvalue()
+
+class BONEPICKER_OT_StoreLibraryPose(Operator):
+    """Move a pose button's pose into the shared pose library"""
+    bl_idname = "bonepicker.store_library_pose"
+    bl_label = "Store in Pose Library"
+    
+    index: IntProperty()
+    tags: StringProperty(name="Tags", description="Comma separated tags to find the pose by", default="")
+    
+    def execute(self, context):
+        obj = context.active_object
+        if not obj or obj.type != 'ARMATURE':
+            self.report({'WARNING'}, "No armature selected")
+            return {'CANCELLED'}
+        
+        item = context.scene.bone_picker_buttons[self.index]
+        try:
+            pose = _get_button_pose(item)
+            if pose is None:
+                self.report({'WARNING'}, "Button has no pose data")
+                return {'CANCELLED'}
+            rig = item.library_rig or obj.data.name
+            name = item.library_pose or item.button_label
+            _store_library_pose(rig, name, pose, _parse_tags(self.tags), _button_thumbnail(item))
+        except Exception as e:
+            self.report({'ERROR'}, f"Failed to store pose: {str(e)}")
+            return {'CANCELLED'}
+        
+        # The .blend only keeps the key from now on
+        item.library_rig = rig
+        item.library_pose = name
+        item.pose_blob = ""
+        item.pose_data = ""
+        _pose_cache.pop(item.as_pointer(), None)
+        self.report({'INFO'}, f"Stored pose in library: {rig} / {name}")
+        return {'FINISHED'}
+    
+    def invoke(self, context, event):
+        return context.window_manager.invoke_props_dialog(self)
+
+class BONEPICKER_OT_LoadLibraryPoses(Operator):
+    """Add buttons for the pose library poses of the active rig"""
+    bl_idname = "bonepicker.load_library_poses"
+    bl_label = "Load Library Poses"
+    
+    tag: StringProperty(name="Tag", description="Only add poses with this tag, all poses when empty", default="")
+    
+    def execute(self, context):
+        obj = context.active_object
+        if not obj or obj.type != 'ARMATURE':
+            self.report({'WARNING'}, "No armature selected")
+            return {'CANCELLED'}
+        
+        rig = obj.data.name
+        try:
+            names = _find_library_poses(rig, self.tag.strip().lower())
+        except Exception as e:
+            self.report({'ERROR'}, f"Failed to read pose library: {str(e)}")
+            return {'CANCELLED'}
+        
+        buttons = context.scene.bone_picker_buttons
+        existing = {btn.library_pose for btn in buttons if btn.library_rig == rig}
+        names = [name for name in names if name not in existing]
+        if not names:
+            self.report({'INFO'}, "No new library poses for this rig")
+            return {'FINISHED'}
+        
+        active_section = context.scene.bone_picker_active_section if hasattr(context.scene, 'bone_picker_active_section') else "1"
+        max_z = max((btn.z_order for btn in buttons if (btn.section or "1") == active_section), default=0)
+        
+        # Only the keys are added, poses and thumbnails load when first used
+        for name in names:
+            item = buttons.add()
+            item.button_label = name
+            item.is_pose = True
+            item.is_empty = False
+            item.library_rig = rig
+            item.library_pose = name
+            item.section = active_section
+            max_z += 1
+            item.z_order = max_z
+            # Green color for pose buttons
+            item.color_r = 0.2
+            item.color_g = 0.6
+            item.color_b = 0.3
+            # Auto-arrange
+            count = len(buttons) - 1
+            item.pos_x = (count % 4) * 120 + 50
+            item.pos_y = (count // 4) * 70 + 50
+        
+        self.report({'INFO'}, f"Added {len(names)} library poses")
+        return {'FINISHED'}
+    
+    def invoke(self, context, event):
+        return context.window_manager.invoke_props_dialog(self)
+
+class BONEPICKER_OT_FindNearestPoses(Operator):
+    """Highlight the saved poses closest to the current pose"""
+    bl_idname = "bonepicker.find_nearest_poses"
+    bl_label = "Find Nearest Poses"
+    
+    count: IntProperty(name="Matches", description="Number of pose buttons to highlight", default=5, min=1, max=50)
+    
+    def execute(self, context):
+        if context.mode != 'POSE':
+            self.report({'WARNING'}, "Must be in Pose Mode")
+            return {'CANCELLED'}
+        
+        obj = context.active_object
+        if not obj or obj.type != 'ARMATURE':
+            self.report({'WARNING'}, "No armature selected")
+            return {'CANCELLED'}
+        
+        began = time.perf_counter()
+        buttons = context.scene.bone_picker_buttons
+        matrix = _get_pose_matrix(obj, context.scene)
+        if not len(matrix.buttons):
+            _set_pose_matches(buttons, {})
+            self.report({'WARNING'}, "No saved poses for this rig")
+            return {'CANCELLED'}
+        
+        distances = matrix.distances(*_current_pose_vectors(obj))
+        count = min(self.count, len(distances))
+        nearest = np.argpartition(distances, count - 1)[:count]
+        nearest = nearest[np.argsort(distances[nearest])]
+        elapsed = (time.perf_counter() - began) * 1000.0
+        
+        _set_pose_matches(buttons, {int(matrix.buttons[row]): rank for rank, row in enumerate(nearest)})
+        
+        matches = ", ".join(f"{buttons[int(matrix.buttons[row])].button_label} ({distances[row]:.3f})" for row in nearest)
+        self.report({'INFO'}, f"Nearest of {len(distances)} poses in {elapsed:.1f} ms: {matches}")
+        return {'FINISHED'}
+
+class BONEPICKER_OT_ClearPoseMatches(Operator):
+    """Remove the nearest pose highlights from the canvas"""
+    bl_idname = "bonepicker.clear_pose_matches"
+    bl_label = "Clear Pose Matches"
+    
+    def execute(self, context):
+        _set_pose_matches(context.scene.bone_picker_buttons, {})
+        return {'FINISHED'}
+
 class BONEPICKER_OT_RemoveButton(Operator):
     """Remove a bone picker button"""
     bl_idname = "bonepicker.remove_button"
@@ -326,6 +1842,9 @@ class BONEPICKER_OT_RemoveButton(Operator):
     
     def execute(self, context):
         context.scene.bone_picker_buttons.remove(self.index)
+        # Indices of the buttons after this one shift down
+        _tag_layout_changed()
+        _tag_order_changed()
         return {'FINISHED'}
 
 class BONEPICKER_OT_CaptureViewport(Operator):
@@ -414,6 +1933,7 @@ class BONEPICKER_OT_CaptureViewport(Operator):
                     
                     image = bpy.data.images.load(temp_cropped)
                     image.name = img_name
+                    invalidate_button_texture(image.name)
                     
                     # Set image to button
                     button.image_name = image.name
@@ -514,6 +2034,9 @@ class BONEPICKER_OT_SetButtonImage(Operator):
                 
                 button.image_name = image.name
                 
+                # Drop the stale GPU texture of the replaced image
+                invalidate_button_texture(image.name)
+                
                 # Force GPU load - Blender 5 compatible
                 try:
                     if hasattr(image, 'gl_load'):
@@ -744,6 +2267,75 @@ class BONEPICKER_OT_UnhideAll(Operator):
         self.report({'INFO'}, f"Unhidden {count} buttons")
         return {'FINISHED'}
 
+class BONEPICKER_OT_ReportMissingBones(Operator):
+    """Report buttons whose bone doesn't exist on the active armature"""
+    bl_idname = "bonepicker.report_missing_bones"
+    bl_label = "Report Missing Bones"
+    
+    def execute(self, context):
+        obj = context.active_object
+        if not obj or obj.type != 'ARMATURE':
+            self.report({'WARNING'}, "No armature selected")
+            return {'CANCELLED'}
+        
+        bone_indices = _bone_index_map(obj, 'DATA')
+        missing = [btn for btn in context.scene.bone_picker_buttons
+                   if not btn.is_empty and not btn.is_pose and btn.bone_name not in bone_indices]
+        if not missing:
+            self.report({'INFO'}, "All buttons point at existing bones")
+            return {'FINISHED'}
+        
+        names = ", ".join(btn.bone_name or "<none>" for btn in missing[:10])
+        if len(missing) > 10:
+            names += f" and {len(missing) - 10} more"
+        self.report({'WARNING'}, f"{len(missing)} buttons point at missing bones: {names}")
+        return {'FINISHED'}
+
+class BONEPICKER_OT_BenchmarkPoses(Operator):
+    """Time decoding and applying the saved poses in the compact and the float format"""
+    bl_idname = "bonepicker.benchmark_poses"
+    bl_label = "Benchmark Pose Formats"
+    
+    repeats: IntProperty(name="Repeats", default=20, min=1, max=1000)
+    
+    def execute(self, context):
+        if context.mode != 'POSE':
+            self.report({'WARNING'}, "Must be in Pose Mode")
+            return {'CANCELLED'}
+        
+        obj = context.active_object
+        if not obj or obj.type != 'ARMATURE':
+            self.report({'WARNING'}, "No armature selected")
+            return {'CANCELLED'}
+        
+        poses = [_get_button_pose(btn, migrate=False) for btn in context.scene.bone_picker_buttons if btn.is_pose]
+        poses = [pose for pose in poses if pose is not None]
+        if not poses:
+            self.report({'WARNING'}, "No saved poses to benchmark")
+            return {'CANCELLED'}
+        
+        formats = (("compact", [_encode_pose(pose) for pose in poses]),
+                   ("float", [_encode_pose(pose, quantize=False) for pose in poses]))
+        bones = obj.pose.bones
+        start = _read_pose_arrays(bones)
+        results = []
+        try:
+            for label, blobs in formats:
+                began = time.perf_counter()
+                for i in range(self.repeats):
+                    for blob in blobs:
+                        _apply_pose(obj, _decode_pose(blob))
+                elapsed = (time.perf_counter() - began) * 1000.0 / (self.repeats * len(blobs))
+                size = sum(len(blob) for blob in blobs) / 1024.0
+                results.append(f"{label} {size:.1f} KB, {elapsed:.3f} ms")
+        finally:
+            # Put the armature back the way it was
+            _write_pose_arrays(bones, start)
+            obj.update_tag(refresh={'DATA'})
+        
+        self.report({'INFO'}, f"{len(poses)} poses, decode + apply per pose: " + "; ".join(results))
+        return {'FINISHED'}
+
 class BONEPICKER_OT_SetSection(Operator):
     """Set section/group for button (1-9)"""
     bl_idname = "bonepicker.set_section"
@@ -830,11 +2422,17 @@ class BONEPICKER_OT_PickBone(Operator):
             self.report({'WARNING'}, "No armature selected")
             return {'CANCELLED'}
         
-        if self.bone_name not in obj.pose.bones:
+        pose_bone = _resolve_bone(obj, self.bone_name)
+        if pose_bone is None:
             self.report({'WARNING'}, f"Bone '{self.bone_name}' not found")
             return {'CANCELLED'}
         
-        pose_bone = obj.pose.bones[self.bone_name]
+        # Write the selection directly, this avoids re-evaluating the rig
+        # Other bones are deselected unless adding to selection
+        if _select_bones(obj, [self.bone_name], 'SELECT', extend=self.add_to_selection):
+            obj.data.bones.active = pose_bone.bone
+            self.report({'INFO'}, f"Selected bone: {self.bone_name}")
+            return {'FINISHED'}
         
         # Deselect all bones if not adding to selection
         if not self.add_to_selection:
@@ -842,7 +2440,7 @@ class BONEPICKER_OT_PickBone(Operator):
         
         # BLENDER 5.0 FIX: Use context.selected_pose_bones_from_active_object
         # This is the proper way to select bones in Blender 5.0
-        # We need to temporarily switch to edit mode, select, then switch back
+        # Fallback: temporarily switch to edit mode, select, then switch back
         
         # Store current mode
         current_mode = context.mode
@@ -866,22 +2464,961 @@ class BONEPICKER_OT_PickBone(Operator):
             # Set as active bone in pose mode
             obj.data.bones.active = pose_bone.bone
             
-            self.report({'INFO'}, f"Selected bone: {self.bone_name}")
+            self.report({'INFO'}, f"Selected bone: {self.bone_name}")
+            _tag_selection_changed()
+            
+        except Exception as e:
+            # If mode switching fails, try to restore original mode
+            try:
+                if context.mode != 'POSE':
+                    bpy.ops.object.mode_set(mode='POSE')
+            except:
+                pass
+            self.report({'WARNING'}, f"Could not select bone: {str(e)}")
+        
+        return {'FINISHED'}
+
+# Global variables for drawing
+_draw_handler = None
+_picker_window_active = False
+
+# Retained per-button draw data
+# Key: (button pointer, kind) -> (signature, data)
+# Entries are only rebuilt when a button's signature changes
+_batch_cache = {}
+# Button set the batch cache was last pruned for
+_batch_cache_key = None
+
+# Merged geometry batches, one per run of buttons in a layer
+# Key: (layer, run index) -> (geometry parts, batch)
+_layer_batch_cache = {}
+
+_QUAD_INDICES = ((0, 1, 2), (2, 3, 0))
+_HANDLE_COLOR = (0.8, 0.5, 0.2, 0.9)
+
+def _quad(x0, y0, x1, y1):
+    """Vertices of an axis aligned quad"""
+    return ((x0, y0), (x1, y0), (x1, y1), (x0, y1))
+
+# Unit circle tables shared by every circle button
+# Key: segment count -> (fan vertices, fan indices)
+_unit_circles = {}
+
+def _circle_segments(radius):
+    """Pick a segment count that keeps a circle outline within half a pixel"""
+    if radius < 1.0:
+        return 8
+    segments = math.pi / math.acos(1.0 - 0.5 / radius)
+    return max(8, min(64, int(math.ceil(segments / 4.0)) * 4))
+
+def _unit_circle(segments):
+    """Return the triangle fan of a unit circle (center vertex first)"""
+    table = _unit_circles.get(segments)
+    if table is None:
+        angles = np.linspace(0.0, 2.0 * math.pi, segments + 1)
+        vertices = np.zeros((segments + 2, 2), dtype=np.float32)
+        vertices[1:, 0] = np.cos(angles)
+        vertices[1:, 1] = np.sin(angles)
+        ring = np.arange(1, segments + 1, dtype=np.int32)
+        indices = np.stack((np.zeros_like(ring), ring, ring + 1), axis=1)
+        table = (vertices, indices)
+        _unit_circles[segments] = table
+    return table
+
+def _circle_fill_vertices(centers, radii, segments):
+    """Scale and translate the unit circle for many circles at once"""
+    unit = _unit_circle(segments)[0]
+    return (np.asarray(centers, dtype=np.float32)[:, None, :] +
+            np.asarray(radii, dtype=np.float32)[:, None, None] * unit[None, :, :])
+
+def _build_button_geometry(x, y, w, h, is_circle, fill_color, border_color, circle_fill=None):
+    """Build vertices, colours and triangles for a button's fill, border and handle"""
+    positions = []
+    colors = []
+    indices = []
+    
+    def add(verts, tris, color):
+        base = sum(len(p) for p in positions)
+        positions.append(np.asarray(verts, dtype=np.float32))
+        colors.append(np.tile(np.asarray(color, dtype=np.float32), (len(verts), 1)))
+        indices.append(np.asarray(tris, dtype=np.int32) + base)
+    
+    # Button background (skipped when an image is drawn instead)
+    if fill_color is not None:
+        if is_circle:
+            if circle_fill is None:
+                radius = min(w, h) / 2
+                circle_fill = _circle_fill_vertices(((x + w / 2, y + h / 2),), (radius,),
+                                                    _circle_segments(radius))[0]
+            add(circle_fill, _unit_circle(len(circle_fill) - 2)[1], fill_color)
+        else:
+            add(_quad(x, y, x + w, y + h), _QUAD_INDICES, fill_color)
+    
+    # Button border as four one pixel quads so it shares the fill's buffer
+    add(_quad(x, y, x + w, y + 1), _QUAD_INDICES, border_color)
+    add(_quad(x + w - 1, y, x + w, y + h), _QUAD_INDICES, border_color)
+    add(_quad(x, y + h - 1, x + w, y + h), _QUAD_INDICES, border_color)
+    add(_quad(x, y, x + 1, y + h), _QUAD_INDICES, border_color)
+    
+    # Resize handle (bottom-right corner) - only for rectangles
+    if not is_circle:
+        handle_size = 10
+        handle_x = x + w - handle_size
+        add(_quad(handle_x, y, handle_x + handle_size, y + handle_size), _QUAD_INDICES, _HANDLE_COLOR)
+    
+    return np.concatenate(positions), np.concatenate(colors), np.concatenate(indices)
+
+def _prepare_button_geometry(requests):
+    """Return geometry for (item, fill_color, border_color) requests
+    
+    Only buttons whose signature changed are rebuilt. Circle fills of all
+    rebuilt buttons are generated together, one pass per segment count.
+    """
+    results = [None] * len(requests)
+    stale = {}
+    for i, (item, fill_color, border_color) in enumerate(requests):
+        key = (item.as_pointer(), 'shape')
+        signature = (item.pos_x, item.pos_y, item.width, item.height, item.is_circle,
+                     fill_color, border_color)
+        entry = _batch_cache.get(key)
+        if entry is not None and entry[0] == signature:
+            results[i] = entry[1]
+        else:
+            stale[i] = (key, signature)
+    
+    if not stale:
+        return results
+    
+    # Group new circle fills by segment count
+    circle_groups = {}
+    for i, (key, signature) in stale.items():
+        x, y, w, h, is_circle, fill_color = signature[:6]
+        if is_circle and fill_color is not None:
+            radius = min(w, h) / 2
+            circle_groups.setdefault(_circle_segments(radius), []).append((i, x + w / 2, y + h / 2, radius))
+    
+    circle_fills = {}
+    for segments, circles in circle_groups.items():
+        params = np.array([circle[1:] for circle in circles], dtype=np.float32)
+        fills = _circle_fill_vertices(params[:, :2], params[:, 2], segments)
+        for circle, fill in zip(circles, fills):
+            circle_fills[circle[0]] = fill
+    
+    for i, (key, signature) in stale.items():
+        geometry = _build_button_geometry(*signature, circle_fill=circle_fills.get(i))
+        _batch_cache[key] = (signature, geometry)
+        results[i] = geometry
+    return results
+
+def _get_image_batch(texture_shader, item, x, y, w, h):
+    """Return the cached textured quad for a button image"""
+    key = (item.as_pointer(), 'image')
+    signature = (x, y, w, h)
+    entry = _batch_cache.get(key)
+    if entry is None or entry[0] != signature:
+        uvs = (
+            (0, 0), (1, 0),
+            (1, 1), (0, 1)
+        )
+        batch = batch_for_shader(
+            texture_shader, 'TRIS',
+            {"pos": _quad(x, y, x + w, y + h), "texCoord": uvs},
+            indices=_QUAD_INDICES
+        )
+        entry = (signature, batch)
+        _batch_cache[key] = entry
+    return entry[1]
+
+def _prune_batch_cache(buttons):
+    """Drop cached batches of buttons that were removed, once per change of the button set"""
+    global _batch_cache_key
+    key = (_order_revision, len(buttons), buttons.id_data.as_pointer())
+    if key == _batch_cache_key:
+        return
+    alive = {btn.as_pointer() for btn in buttons}
+    for cache_key in [cache_key for cache_key in _batch_cache if cache_key[0] not in alive]:
+        del _batch_cache[cache_key]
+    _batch_cache_key = key
+
+def _merge_geometry(parts):
+    """Pack several buttons' geometry into one vertex and index buffer"""
+    offsets = np.cumsum([0] + [len(part[0]) for part in parts[:-1]])
+    positions = np.concatenate([part[0] for part in parts])
+    colors = np.concatenate([part[1] for part in parts])
+    indices = np.concatenate([part[2] + offset for part, offset in zip(parts, offsets)]).astype(np.int32)
+    return positions, colors, indices
+
+def _get_merged_batch(key, parts, build):
+    """Return the merged batch for key, rebuilding it only if a part changed"""
+    entry = _layer_batch_cache.get(key)
+    # Reuse the merged batch while every part is the same cached object
+    if (entry is None or len(entry[0]) != len(parts) or
+            any(old is not new for old, new in zip(entry[0], parts))):
+        entry = (tuple(parts), build(parts))
+        _layer_batch_cache[key] = entry
+    return entry[1]
+
+def _draw_geometry_run(shader, key, parts):
+    """Draw a run of buttons with a single merged batch"""
+    if not parts:
+        return
+    
+    def build(parts):
+        positions, colors, indices = _merge_geometry(parts)
+        return batch_for_shader(shader, 'TRIS', {"pos": positions, "color": colors}, indices=indices)
+    
+    batch = _get_merged_batch(key, parts, build)
+    shader.bind()
+    batch.draw(shader)
+
+def invalidate_button_texture(image_name):
+    """Forget the cached texture of an image that was replaced or reloaded"""
+    _tag_static_changed()
+    global _loaded_textures_bytes
+    entry = _loaded_textures.pop(image_name, None)
+    if entry is not None:
+        _loaded_textures_bytes -= entry[2]
+    _texture_generations[image_name] = _texture_generations.get(image_name, 0) + 1
+
+def _texture_stamp(image):
+    """Values that change when an image needs a new GPU texture"""
+    return (image.filepath, tuple(image.size), _texture_generations.get(image.name, 0))
+
+def _texture_budget_bytes(context):
+    """VRAM budget for button textures from the add-on preferences"""
+    addon = context.preferences.addons.get(__name__)
+    budget_mb = addon.preferences.texture_budget_mb if addon else 256
+    return budget_mb * 1024 * 1024
+
+def _evict_textures(budget):
+    """Free least recently used textures until the cache fits the budget"""
+    global _loaded_textures_bytes
+    # Always keep the most recent texture, even if it alone exceeds the budget
+    while _loaded_textures_bytes > budget and len(_loaded_textures) > 1:
+        image_name, (stamp, texture, size) = _loaded_textures.popitem(last=False)
+        _loaded_textures_bytes -= size
+        image = bpy.data.images.get(image_name)
+        if image is not None and hasattr(image, 'gl_free'):
+            try:
+                image.gl_free()
+            except:
+                pass
+
+def _get_image_texture(context, image):
+    """Return the GPU texture of an image, loading it only on a cache miss"""
+    global _loaded_textures_bytes
+    entry = _loaded_textures.get(image.name)
+    if entry is not None:
+        if entry[0] == _texture_stamp(image):
+            _loaded_textures.move_to_end(image.name)
+            return entry[1]
+        del _loaded_textures[image.name]
+        _loaded_textures_bytes -= entry[2]
+    
+    # Ensure image is loaded - Blender 5 compatible
+    if not image.has_data:
+        try:
+            image.reload()
+        except:
+            pass
+    
+    # Try to load GPU texture - Blender 5 compatible
+    bindcode = 0
+    try:
+        if hasattr(image, 'bindcode'):
+            bindcode = image.bindcode
+        
+        if bindcode == 0 and hasattr(image, 'gl_load'):
+            try:
+                image.gl_load()
+                bindcode = image.bindcode if hasattr(image, 'bindcode') else 0
+            except:
+                pass
+    except:
+        pass
+    
+    if bindcode == 0 and not image.has_data:
+        return None
+    
+    texture = gpu.texture.from_image(image)
+    
+    # Float images take four times the memory of byte images
+    size = image.size[0] * image.size[1] * (16 if image.is_float else 4)
+    _loaded_textures[image.name] = (_texture_stamp(image), texture, size)
+    _loaded_textures_bytes += size
+    _evict_textures(_image_texture_budget(context))
+    return texture
+
+def _image_texture_budget(context):
+    """Part of the texture budget left for single image textures next to the atlas pages"""
+    return _texture_budget_bytes(context) - len(_atlas_pages) * _atlas_page_bytes()
+
+def _release_image_texture(image_name):
+    """Free the cached texture of an image that now lives in the atlas"""
+    global _loaded_textures_bytes
+    entry = _loaded_textures.pop(image_name, None)
+    if entry is None:
+        return
+    _loaded_textures_bytes -= entry[2]
+    image = bpy.data.images.get(image_name)
+    if image is not None and hasattr(image, 'gl_free'):
+        try:
+            image.gl_free()
+        except:
+            pass
+
+def _get_library_thumbnail(item):
+    """(GPU texture, width, height) of a library pose's thumbnail, read on first use"""
+    key = (item.library_rig, item.library_pose)
+    if key in _library_thumbnails:
+        return _library_thumbnails[key]
+    
+    entry = None
+    try:
+        row = _get_library().execute(
+            "SELECT thumbnail FROM poses WHERE rig = ? AND name = ?", key).fetchone()
+        if row is not None and row[0]:
+            thumbnail = Image.open(io.BytesIO(row[0])).convert('RGBA')
+            width, height = thumbnail.size
+            # GPU textures start at the bottom row
+            pixels = np.flipud(np.asarray(thumbnail, dtype=np.float32) / 255.0).ravel()
+            buffer = gpu.types.Buffer('FLOAT', len(pixels), pixels)
+            entry = (gpu.types.GPUTexture((width, height), format='RGBA8', data=buffer), width, height)
+    except Exception as e:
+        print(f"Error loading pose thumbnail: {e}")
+    _library_thumbnails[key] = entry
+    return entry
+
+# Texture atlas for button images
+# Images are drawn into shelves of offscreen pages so that consecutive
+# image buttons can be drawn with one textured call per page
+_ATLAS_PAGE_SIZE = 2048
+_ATLAS_MAX_TILE = 512  # Bigger images are scaled down to this size
+_ATLAS_PADDING = 2
+
+_atlas_pages = []
+# Key: image name -> (change stamp, page index, x, y, width, height, slot width, slot height)
+_atlas_slots = {}
+_atlas_reset_pending = False
+# Images asked for since the start of the current redraw
+_atlas_drawn = set()
+
+class _AtlasPage:
+    """Offscreen texture that button images are packed into on shelves"""
+    
+    def __init__(self, size):
+        self.size = size
+        self.offscreen = gpu.types.GPUOffScreen(size, size)
+        self.shelves = []  # [y, height, next free x]
+        self.shelf_top = 0
+        self.is_cleared = False
+    
+    def allocate(self, width, height):
+        """Reserve a rectangle on the page, returns (x, y) or None if full"""
+        width += _ATLAS_PADDING
+        height += _ATLAS_PADDING
+        
+        # Use the lowest shelf the tile fits in, or open a new one
+        best = None
+        for shelf in self.shelves:
+            if shelf[1] >= height and self.size - shelf[2] >= width:
+                if best is None or shelf[1] < best[1]:
+                    best = shelf
+        if best is None:
+            if width > self.size or self.size - self.shelf_top < height:
+                return None
+            best = [self.shelf_top, height, 0]
+            self.shelves.append(best)
+            self.shelf_top += height
+        
+        x = best[2]
+        best[2] += width
+        return x, best[0]
+    
+    def blit(self, texture, x, y, width, height):
+        """Draw a texture into a rectangle of the page"""
+        # Page pixels to normalized device coordinates
+        x0 = x / self.size * 2.0 - 1.0
+        y0 = y / self.size * 2.0 - 1.0
+        x1 = (x + width) / self.size * 2.0 - 1.0
+        y1 = (y + height) / self.size * 2.0 - 1.0
+        
+        shader = gpu.shader.from_builtin('IMAGE')
+        batch = batch_for_shader(
+            shader, 'TRIS',
+            {"pos": _quad(x0, y0, x1, y1), "texCoord": _quad(0, 0, 1, 1)},
+            indices=_QUAD_INDICES
+        )
+        
+        previous_blend = gpu.state.blend_get()
+        with self.offscreen.bind():
+            if not self.is_cleared:
+                gpu.state.active_framebuffer_get().clear(color=(0.0, 0.0, 0.0, 0.0))
+                self.is_cleared = True
+            with gpu.matrix.push_pop(), gpu.matrix.push_pop_projection():
+                gpu.matrix.load_identity()
+                gpu.matrix.load_projection_matrix(Matrix.Identity(4))
+                # Overwrite the tile, including alpha, instead of blending
+                gpu.state.blend_set('NONE')
+                shader.bind()
+                shader.uniform_sampler("image", texture)
+                batch.draw(shader)
+        gpu.state.blend_set(previous_blend)
+    
+    def free(self):
+        self.offscreen.free()
+
+def _atlas_page_bytes():
+    return _ATLAS_PAGE_SIZE * _ATLAS_PAGE_SIZE * 4
+
+def _clear_atlas():
+    """Free all atlas pages"""
+    for page in _atlas_pages:
+        try:
+            page.free()
+        except:
+            pass
+    _atlas_pages.clear()
+    _atlas_slots.clear()
+
+def _apply_pending_atlas_reset():
+    """Repack the atlas from scratch after it went over the texture budget
+    
+    Done at the start of a redraw so slots handed out during the previous
+    redraw are never freed while in use. Only the images drawn from then on
+    (the active section) are packed again.
+    """
+    global _atlas_reset_pending
+    _atlas_drawn.clear()
+    if _atlas_reset_pending:
+        _atlas_reset_pending = False
+        _clear_atlas()
+
+def _atlas_tile_size(image):
+    """Size of an image inside the atlas, scaled down to the maximum tile size"""
+    width = image.size[0] if len(image.size) > 0 else 1
+    height = image.size[1] if len(image.size) > 1 else 1
+    scale = min(1.0, _ATLAS_MAX_TILE / max(width, height, 1))
+    return max(1, int(width * scale)), max(1, int(height * scale))
+
+def _get_atlas_slot(context, image):
+    """Pack an image into the atlas if needed and return its slot
+    
+    A replaced image is redrawn into its old tile when it still fits, so
+    the rest of the atlas is left untouched. Returns None when the atlas is
+    out of budget, the image is then drawn from its own texture.
+    """
+    global _atlas_reset_pending
+    _atlas_drawn.add(image.name)
+    stamp = _texture_stamp(image)
+    slot = _atlas_slots.get(image.name)
+    if slot is not None and slot[0] == stamp:
+        return slot
+    
+    texture = _get_image_texture(context, image)
+    if texture is None:
+        return None
+    width, height = _atlas_tile_size(image)
+    
+    if slot is not None and width <= slot[6] and height <= slot[7]:
+        page_index, x, y = slot[1:4]
+        slot_width, slot_height = slot[6:8]
+    else:
+        page_index = None
+        for index, page in enumerate(_atlas_pages):
+            position = page.allocate(width, height)
+            if position is not None:
+                page_index = index
+                break
+        if page_index is None:
+            if (len(_atlas_pages) + 1) * _atlas_page_bytes() > _texture_budget_bytes(context):
+                # Repacking only helps while the atlas holds images that aren't
+                # drawn any more, otherwise it would be repacked every redraw
+                if any(name not in _atlas_drawn for name in _atlas_slots):
+                    _atlas_reset_pending = True
+                return None
+            try:
+                page = _AtlasPage(_ATLAS_PAGE_SIZE)
+            except Exception as e:
+                print(f"Error creating texture atlas page: {e}")
+                return None
+            position = page.allocate(width, height)
+            if position is None:
+                page.free()
+                return None
+            _atlas_pages.append(page)
+            page_index = len(_atlas_pages) - 1
+            # The new page comes out of the single textures' share
+            _evict_textures(_image_texture_budget(context))
+        x, y = position
+        slot_width, slot_height = width, height
+    
+    _atlas_pages[page_index].blit(texture, x, y, width, height)
+    slot = (stamp, page_index, x, y, width, height, slot_width, slot_height)
+    _atlas_slots[image.name] = slot
+    # The atlas holds a copy now, don't keep the texture twice
+    _release_image_texture(image.name)
+    return slot
+
+def _fit_image_rect(x, y, w, h, size):
+    """Fit an image of a size inside a button rectangle without stretching it"""
+    # Calculate aspect ratio to prevent stretching
+    img_width = size[0] if len(size) > 0 else 1
+    img_height = size[1] if len(size) > 1 else 1
+    img_aspect = img_width / img_height if img_height > 0 else 1.0
+    button_aspect = w / h if h > 0 else 1.0
+    
+    # Calculate fitted dimensions
+    if img_aspect > button_aspect:
+        # Image is wider - fit to width
+        fit_w = w
+        fit_h = w / img_aspect
+        offset_x = 0
+        offset_y = (h - fit_h) / 2
+    else:
+        # Image is taller - fit to height
+        fit_h = h
+        fit_w = h * img_aspect
+        offset_x = (w - fit_w) / 2
+        offset_y = 0
+    
+    return x + offset_x, y + offset_y, fit_w, fit_h
+
+def _get_atlas_quad(context, item):
+    """Return (page index, positions, uvs) of a button image in the atlas"""
+    try:
+        image = bpy.data.images[item.image_name]
+        slot = _get_atlas_slot(context, image)
+    except Exception as e:
+        print(f"Error packing image into atlas: {e}")
+        return None
+    if slot is None:
+        return None
+    
+    key = (item.as_pointer(), 'atlas')
+    signature = (item.pos_x, item.pos_y, item.width, item.height, slot)
+    entry = _batch_cache.get(key)
+    if entry is None or entry[0] != signature:
+        x, y, w, h = _fit_image_rect(item.pos_x, item.pos_y, item.width, item.height, image.size)
+        # UV rectangle of the tile, inset by half a texel to avoid bleeding
+        page_index, tile_x, tile_y, tile_w, tile_h = slot[1:6]
+        size = _atlas_pages[page_index].size
+        uvs = _quad((tile_x + 0.5) / size, (tile_y + 0.5) / size,
+                    (tile_x + tile_w - 0.5) / size, (tile_y + tile_h - 0.5) / size)
+        entry = (signature, (page_index, _quad(x, y, x + w, y + h), uvs))
+        _batch_cache[key] = entry
+    return entry[1]
+
+def _draw_image_group(key, quads):
+    """Draw the atlas images of several buttons, one call per atlas page"""
+    if not quads:
+        return
+    
+    shader = gpu.shader.from_builtin('IMAGE')
+    pages = {}
+    for quad in quads:
+        pages.setdefault(quad[0], []).append(quad)
+    
+    def build(page_quads):
+        positions = np.array([quad[1] for quad in page_quads], dtype=np.float32).reshape(-1, 2)
+        uvs = np.array([quad[2] for quad in page_quads], dtype=np.float32).reshape(-1, 2)
+        offsets = np.arange(len(page_quads), dtype=np.int32)[:, None, None] * 4
+        indices = (offsets + np.array(_QUAD_INDICES, dtype=np.int32)[None]).reshape(-1, 3)
+        return batch_for_shader(shader, 'TRIS', {"pos": positions, "texCoord": uvs}, indices=indices)
+    
+    previous_blend = gpu.state.blend_get()
+    gpu.state.blend_set('ALPHA')
+    for page_index, page_quads in pages.items():
+        batch = _get_merged_batch(key + (page_index,), page_quads, build)
+        shader.bind()
+        shader.uniform_sampler("image", _atlas_pages[page_index].offscreen.texture_color)
+        batch.draw(shader)
+    gpu.state.blend_set(previous_blend)
+
+def _rects_overlap(a, b):
+    return a[0] < b[0] + b[2] and b[0] < a[0] + a[2] and a[1] < b[1] + b[3] and b[1] < a[1] + a[3]
+
+def _draw_button_image(context, item):
+    """Draw the image of a button fitted to its rectangle, returns True on success"""
+    x = item.pos_x
+    y = item.pos_y
+    w = item.width
+    h = item.height
+    
+    try:
+        # Library poses without an image of their own show the library thumbnail
+        thumbnail = _get_library_thumbnail(item) if item.library_pose and not item.image_name else None
+        if thumbnail is not None:
+            texture, size = thumbnail[0], thumbnail[1:]
+        else:
+            image = bpy.data.images[item.image_name]
+            texture = _get_image_texture(context, image)
+            size = image.size
+        if texture is None:
+            return False
+        
+        img_x, img_y, fit_w, fit_h = _fit_image_rect(x, y, w, h, size)
+        
+        try:
+            # Create shader for textured quad
+            texture_shader = gpu.shader.from_builtin('IMAGE')
+            
+            # Reuse the cached textured quad unless the fit changed
+            batch = _get_image_batch(texture_shader, item, img_x, img_y, fit_w, fit_h)
             
+            # Bind texture and draw
+            previous_blend = gpu.state.blend_get()
+            gpu.state.blend_set('ALPHA')
+            texture_shader.bind()
+            texture_shader.uniform_sampler("image", texture)
+            batch.draw(texture_shader)
+            gpu.state.blend_set(previous_blend)
+            return True
         except Exception as e:
-            # If mode switching fails, try to restore original mode
-            try:
-                if context.mode != 'POSE':
-                    bpy.ops.object.mode_set(mode='POSE')
-            except:
-                pass
-            self.report({'WARNING'}, f"Could not select bone: {str(e)}")
+            print(f"Error drawing image texture: {e}")
+            return False
+    except Exception as e:
+        print(f"Error loading image: {e}")
+        return False
+
+# Measured button labels
+# Key: (label, font size, button width) -> (text, baseline offset, text height) or None
+_label_cache = {}
+_LABEL_FONT_SIZE = 12
+_LABEL_PADDING = 10
+
+def _layout_label(font_id, label, width):
+    """Measure a label and shorten it with an ellipsis to fit a button width
+    
+    Returns None when not even the first character fits. Expects blf.size to
+    be set to _LABEL_FONT_SIZE already.
+    """
+    key = (label, _LABEL_FONT_SIZE, width)
+    if key in _label_cache:
+        return _label_cache[key]
+    if len(_label_cache) > 4096:
+        _label_cache.clear()
+    
+    available = width - _LABEL_PADDING * 2
+    text = label
+    if blf.dimensions(font_id, text)[0] > available:
+        # Longest prefix that still fits together with the ellipsis
+        low, high = 0, len(label) - 1
+        while low < high:
+            middle = (low + high + 1) // 2
+            if blf.dimensions(font_id, label[:middle] + "...")[0] <= available:
+                low = middle
+            else:
+                high = middle - 1
+        text = label[:low].rstrip() + "..." if low > 0 else None
+    
+    layout = None
+    if text is not None:
+        # Center the capital letters vertically on the button
+        cap_height = blf.dimensions(font_id, "X")[1]
+        layout = (text, -cap_height / 2, cap_height)
+    _label_cache[key] = layout
+    return layout
+
+# Uniform grid over button rectangles, one per section
+# Key: section -> {(cell x, cell y): [button indices]}
+_GRID_CELL_SIZE = 128
+_RESIZE_HANDLE_SIZE = 10
+_spatial_index = {}
+_spatial_rects = {}  # Button index -> (x, y, width, height)
+_spatial_sections = {}  # Button index -> section
+_spatial_index_key = None
+
+def _grid_cells(x0, y0, x1, y1):
+    """Grid cells covered by a rectangle given by its corners"""
+    cx0 = math.floor(x0 / _GRID_CELL_SIZE)
+    cy0 = math.floor(y0 / _GRID_CELL_SIZE)
+    cx1 = math.floor(x1 / _GRID_CELL_SIZE)
+    cy1 = math.floor(y1 / _GRID_CELL_SIZE)
+    return [(cx, cy) for cx in range(cx0, cx1 + 1) for cy in range(cy0, cy1 + 1)]
+
+def _add_spatial_entry(index, item):
+    rect = (item.pos_x, item.pos_y, item.width, item.height)
+    section = item.section if item.section else "1"
+    _spatial_rects[index] = rect
+    _spatial_sections[index] = section
+    cells = _spatial_index.setdefault(section, {})
+    for cell in _grid_cells(rect[0], rect[1], rect[0] + rect[2], rect[1] + rect[3]):
+        cells.setdefault(cell, []).append(index)
+
+def _remove_spatial_entry(index):
+    x, y, w, h = _spatial_rects.pop(index)
+    cells = _spatial_index[_spatial_sections.pop(index)]
+    for cell in _grid_cells(x, y, x + w, y + h):
+        cells[cell].remove(index)
+        if not cells[cell]:
+            del cells[cell]
+
+def _ensure_spatial_index(buttons):
+    """Rebuild the grid if buttons were added, removed or replaced since it was built"""
+    global _spatial_index_key
+    key = (_layout_revision, len(buttons), buttons.id_data.as_pointer())
+    if key == _spatial_index_key:
+        return
+    _spatial_index.clear()
+    _spatial_rects.clear()
+    _spatial_sections.clear()
+    for index, item in enumerate(buttons):
+        _add_spatial_entry(index, item)
+    _spatial_index_key = key
+
+def _update_spatial_entry(item):
+    """Move one button in the grid after it was dragged, resized or changed section
+    
+    Returns False if the button isn't in the current grid and it has to be rebuilt.
+    """
+    if _spatial_index_key is None or item.id_data.as_pointer() != _spatial_index_key[2]:
+        # Not indexed yet, or a button of another scene
+        return _spatial_index_key is None
+    index = _button_index(item)
+    if index not in _spatial_rects:
+        return False
+    _remove_spatial_entry(index)
+    _add_spatial_entry(index, item)
+    return True
+
+def _query_spatial_index(buttons, section, x0, y0, x1, y1):
+    """Indices of the buttons of a section that overlap a rectangle"""
+    _ensure_spatial_index(buttons)
+    cells = _spatial_index.get(section)
+    if not cells:
+        return set()
+    
+    # Visit whichever is smaller: the query's cells or the occupied cells
+    query_cells = _grid_cells(x0, y0, x1, y1)
+    if len(query_cells) > len(cells):
+        query_cells = cells.keys()
+    
+    found = set()
+    for cell in query_cells:
+        for index in cells.get(cell, ()):
+            if index in found:
+                continue
+            x, y, w, h = _spatial_rects[index]
+            if x <= x1 and x + w >= x0 and y <= y1 and y + h >= y0:
+                found.add(index)
+    return found
+
+def _buttons_at(buttons, section, x, y, show_all_hidden=False, resize_handle=False):
+    """Indices of the buttons under a point, top-most first
+    
+    Bone buttons come before empty buttons, then higher z_order, then
+    earlier buttons in the collection. With resize_handle only buttons
+    whose resize handle is under the point are returned.
+    """
+    _ensure_spatial_index(buttons)
+    cells = _spatial_index.get(section)
+    if not cells:
+        return []
+    
+    hits = []
+    for index in cells.get((math.floor(x / _GRID_CELL_SIZE), math.floor(y / _GRID_CELL_SIZE)), ()):
+        bx, by, bw, bh = _spatial_rects[index]
+        if resize_handle:
+            # The handle sits in the bottom right corner
+            bx = bx + bw - _RESIZE_HANDLE_SIZE
+            bw = bh = _RESIZE_HANDLE_SIZE
+        if not (bx <= x <= bx + bw and by <= y <= by + bh):
+            continue
+        item = buttons[index]
+        if item.is_hidden and not show_all_hidden:
+            continue
+        hits.append(((not item.is_empty, item.z_order, -index), index))
+    hits.sort(reverse=True)
+    return [index for key, index in hits]
+
+# Per-section button order, sorted once and reused by every redraw
+# Key: section -> (empty layer, bone layer)
+# Layers run bottom to top, entries are (index, is_hidden)
+_draw_order = {}
+_draw_order_key = None
+
+def _ensure_draw_order(buttons):
+    """Sort the buttons again if any section, z_order, visibility or type changed"""
+    global _draw_order_key
+    key = (_order_revision, len(buttons), buttons.id_data.as_pointer())
+    if key == _draw_order_key:
+        return
+    
+    _draw_order.clear()
+    entries = {}
+    for index, item in enumerate(buttons):
+        section = item.section if item.section else "1"
+        entries.setdefault(section, []).append((not item.is_empty, item.z_order, index, item.is_hidden))
+    
+    for section, section_entries in entries.items():
+        # Same z_order keeps collection order, later buttons draw on top
+        section_entries.sort(key=lambda entry: (entry[0], entry[1], entry[2]))
+        empty_layer = [(index, is_hidden) for is_bone, z_order, index, is_hidden in section_entries if not is_bone]
+        bone_layer = [(index, is_hidden) for is_bone, z_order, index, is_hidden in section_entries if is_bone]
+        _draw_order[section] = (empty_layer, bone_layer)
+    _draw_order_key = key
+
+def _section_draw_order(buttons, section):
+    """(empty layer, bone layer) of a section"""
+    _ensure_draw_order(buttons)
+    return _draw_order.get(section, ((), ()))
+
+def _draw_layer(context, shader, layer, draws, font_id):
+    """Draw one canvas layer with as few draw calls as possible
+    
+    Consecutive buttons are packed into one merged batch. Image buttons end
+    the current run so their image still lands above the buttons below them
+    and under the ones above them. Labels are drawn right after their run,
+    and a button overlapping a label of the run starts a new one.
+    """
+    # Buttons whose image exists draw it in place of their fill
+    with_image = [use_image and bool(item.image_name) and item.image_name in bpy.data.images
+                  for item, fill_color, border_color, use_image in draws]
+    # Library thumbnails are drawn on their own, outside the atlas
+    thumbnails = [use_image and not has_image and bool(item.library_pose) and _get_library_thumbnail(item) is not None
+                  for (item, fill_color, border_color, use_image), has_image in zip(draws, with_image)]
+    geometry = _prepare_button_geometry([
+        (item, None if has_image or has_thumbnail else fill_color, border_color)
+        for (item, fill_color, border_color, use_image), has_image, has_thumbnail in zip(draws, with_image, thumbnails)
+    ])
+    
+    # Consecutive image buttons that don't overlap share one image draw.
+    # Their borders and everything above them go into the run drawn after.
+    run = []
+    group = []
+    group_rects = []
+    group_open = False
+    labels = []
+    label_rects = []
+    flush_index = 0
+    
+    def flush():
+        nonlocal run, group, group_rects, labels, label_rects, flush_index
+        _draw_image_group((layer, 'images', flush_index), group)
+        _draw_geometry_run(shader, (layer, flush_index), run)
+        # Button text - font size and colour are set once per redraw
+        for item, layout in labels:
+            blf.position(font_id, item.pos_x + _LABEL_PADDING, item.pos_y + item.height / 2 + layout[1], 0)
+            blf.draw(font_id, layout[0])
+        run = []
+        group = []
+        group_rects = []
+        labels = []
+        label_rects = []
+        flush_index += 1
+    
+    for (item, fill_color, border_color, use_image), has_image, has_thumbnail, parts in zip(draws, with_image, thumbnails, geometry):
+        rect = (item.pos_x, item.pos_y, item.width, item.height)
+        # A button over a label of this run has to be drawn after that label
+        covers_label = any(_rects_overlap(rect, other) for other in label_rects)
+        quad = _get_atlas_quad(context, item) if has_image else None
+        if quad is not None:
+            if covers_label or not group_open or any(_rects_overlap(rect, other) for other in group_rects):
+                flush()
+                group_open = True
+            group.append(quad)
+            group_rects.append(rect)
+        else:
+            group_open = False
+            if has_image or has_thumbnail:
+                # No atlas slot - draw this image on its own
+                flush()
+                if not _draw_button_image(context, item):
+                    # Fall back to the plain background
+                    parts = _prepare_button_geometry([(item, fill_color, border_color)])[0]
+            elif covers_label:
+                flush()
+        run.append(parts)
         
-        return {'FINISHED'}
+        if item.is_circle or not item.button_label:
+            continue
+        layout = _layout_label(font_id, item.button_label, item.width)
+        # Skip labels that don't fit the button at all
+        if layout is None or layout[2] > item.height:
+            continue
+        labels.append((item, layout))
+        label_rects.append(rect)
+    flush()
 
-# Global variables for drawing
-_draw_handler = None
-_picker_window_active = False
+# Offscreen copy of the static bottom of the empty layer
+# Locked empty buttons (backgrounds, silhouettes, reference images) are
+# rendered once and composited with a single textured quad per redraw
+_static_layer = {'offscreen': None, 'batch': None, 'key': None}
+
+def _is_static_button(item, show_all_hidden):
+    """Locked empty buttons without a highlight look the same every redraw"""
+    return item.is_empty and item.is_locked and not (item.is_hidden and show_all_hidden)
+
+def _free_static_layer():
+    if _static_layer['offscreen'] is not None:
+        try:
+            _static_layer['offscreen'].free()
+        except:
+            pass
+    _static_layer['offscreen'] = None
+    _static_layer['batch'] = None
+    _static_layer['key'] = None
+
+def _draw_static_layer(context, shader, draws, font_id):
+    """Composite the static buttons from the offscreen copy, rendering it first if stale
+    
+    Returns False if no offscreen could be used and the buttons must be drawn live.
+    """
+    if not draws:
+        return True
+    
+    width = context.region.width
+    height = context.region.height
+    if width <= 0 or height <= 0:
+        return False
+    
+    image_shader = gpu.shader.from_builtin('IMAGE')
+    offscreen = _static_layer['offscreen']
+    if offscreen is None or offscreen.width != width or offscreen.height != height:
+        _free_static_layer()
+        try:
+            offscreen = gpu.types.GPUOffScreen(width, height)
+        except Exception as e:
+            print(f"Error creating static layer offscreen: {e}")
+            return False
+        _static_layer['offscreen'] = offscreen
+        _static_layer['batch'] = batch_for_shader(
+            image_shader, 'TRIS',
+            {"pos": _quad(0, 0, width, height), "texCoord": _quad(0, 0, 1, 1)},
+            indices=_QUAD_INDICES
+        )
+    
+    active_section = context.scene.bone_picker_active_section if hasattr(context.scene, 'bone_picker_active_section') else "1"
+    key = (_static_revision, active_section, tuple(item.as_pointer() for item, fill_color, border_color, use_image in draws))
+    if _static_layer['key'] != key:
+        # Region pixels to normalized device coordinates
+        projection = Matrix((
+            (2.0 / width, 0.0, 0.0, -1.0),
+            (0.0, 2.0 / height, 0.0, -1.0),
+            (0.0, 0.0, 1.0, 0.0),
+            (0.0, 0.0, 0.0, 1.0),
+        ))
+        with offscreen.bind():
+            gpu.state.active_framebuffer_get().clear(color=(0.0, 0.0, 0.0, 0.0))
+            with gpu.matrix.push_pop(), gpu.matrix.push_pop_projection():
+                gpu.matrix.load_identity()
+                gpu.matrix.load_projection_matrix(projection)
+                # Fills keep their alpha when drawn without blending, force it
+                # to opaque so the copy composites like the live canvas. Images
+                # blended onto transparent black leave premultiplied colour behind.
+                opaque_draws = [(item, fill_color[:3] + (1.0,), border_color[:3] + (1.0,), use_image)
+                                for item, fill_color, border_color, use_image in draws]
+                _draw_layer(context, shader, 'STATIC', opaque_draws, font_id)
+        _static_layer['key'] = key
+    
+    previous_blend = gpu.state.blend_get()
+    gpu.state.blend_set('ALPHA_PREMULT')
+    image_shader.bind()
+    image_shader.uniform_sampler("image", offscreen.texture_color)
+    _static_layer['batch'].draw(image_shader)
+    gpu.state.blend_set(previous_blend)
+    return True
 
 def draw_callback_px(self, context):
     """Draw the picker canvas"""
@@ -892,18 +3429,20 @@ def draw_callback_px(self, context):
     if context.mode != 'POSE':
         return
     
+    _apply_pending_atlas_reset()
+    
     font_id = 0
+    blf.size(font_id, _LABEL_FONT_SIZE)
+    blf.color(font_id, 1.0, 1.0, 1.0, 1.0)
+    
+    # Layers are merged into batches with per-vertex colour
+    shader = gpu.shader.from_builtin('SMOOTH_COLOR')
     
-    # Draw background
-    shader = gpu.shader.from_builtin('UNIFORM_COLOR')
+    # Button fills are drawn opaque, only images blend
+    gpu.state.blend_set('NONE')
     
     # Get selected bones for highlighting
-    selected_bone_names = set()
-    if context.active_object and context.active_object.type == 'ARMATURE':
-        try:
-            selected_bone_names = {bone.name for bone in context.selected_pose_bones}
-        except:
-            pass
+    selected_bone_names = _get_selected_bone_names(context)
     
     # Get interactive resizing button
     interactive_resize_button = None
@@ -935,205 +3474,55 @@ def draw_callback_px(self, context):
     # Get active section
     active_section = context.scene.bone_picker_active_section if hasattr(context.scene, 'bone_picker_active_section') else "1"
     
-    for item in context.scene.bone_picker_buttons:
-        # Only show buttons from active section
-        item_section = item.section if item.section else "1"
-        if item_section != active_section:
-            continue
-            
-        # Skip hidden buttons unless show_all_hidden is active
-        if item.is_hidden and not show_all_hidden:
-            continue
-            
-        if item.is_empty:
-            empty_buttons.append(item)
-        else:
-            bone_buttons.append(item)
+    # Forget batches of buttons that no longer exist
+    buttons = context.scene.bone_picker_buttons
+    _prune_batch_cache(buttons)
+    
+    # Nearest pose search results by button pointer, for this redraw only
+    pose_matches = {buttons[index].as_pointer(): rank for index, rank in _get_pose_matches(buttons).items()
+                    if index < len(buttons)}
     
-    # Sort by z_order (lower values draw first, higher values on top)
-    empty_buttons.sort(key=lambda x: x.z_order)
-    bone_buttons.sort(key=lambda x: x.z_order)
+    # Only buttons from the active section that overlap the region are drawn
+    region = context.region
+    visible = _query_spatial_index(buttons, active_section, 0, 0, region.width, region.height)
+    
+    # Both layers come sorted by z_order (lower values draw first, higher values on top)
+    empty_order, bone_order = _section_draw_order(buttons, active_section)
+    for order, layer_buttons in ((empty_order, empty_buttons), (bone_order, bone_buttons)):
+        for index, is_hidden in order:
+            # Skip hidden buttons unless show_all_hidden is active
+            if is_hidden and not show_all_hidden:
+                continue
+            if index in visible:
+                layer_buttons.append(buttons[index])
     
     # LAYER 1: Draw empty buttons first (bottom layer - always behind everything)
+    empty_draws = []
     for item in empty_buttons:
         
         # Check if this is a temporarily visible hidden button
         is_temp_visible = item.is_hidden and show_all_hidden
-            
-        x = item.pos_x
-        y = item.pos_y
-        w = item.width
-        h = item.height
-        
-        # Check if image exists and draw it
-        has_image = False
-        if item.image_name and item.image_name in bpy.data.images:
-            try:
-                image = bpy.data.images[item.image_name]
-                
-                # Ensure image is loaded - Blender 5 compatible
-                if not image.has_data:
-                    try:
-                        image.reload()
-                    except:
-                        pass
-                
-                # Try to load GPU texture - Blender 5 compatible
-                bindcode = 0
-                try:
-                    if hasattr(image, 'bindcode'):
-                        bindcode = image.bindcode
-                    
-                    if bindcode == 0 and hasattr(image, 'gl_load'):
-                        try:
-                            image.gl_load()
-                            bindcode = image.bindcode if hasattr(image, 'bindcode') else 0
-                        except:
-                            pass
-                except:
-                    pass
-                
-                # Draw image using GPU module
-                if bindcode != 0 or image.has_data:
-                    # Calculate aspect ratio to prevent stretching
-                    img_width = image.size[0] if len(image.size) > 0 else 1
-                    img_height = image.size[1] if len(image.size) > 1 else 1
-                    img_aspect = img_width / img_height if img_height > 0 else 1.0
-                    button_aspect = w / h if h > 0 else 1.0
-                    
-                    # Calculate fitted dimensions
-                    if img_aspect > button_aspect:
-                        # Image is wider - fit to width
-                        fit_w = w
-                        fit_h = w / img_aspect
-                        offset_x = 0
-                        offset_y = (h - fit_h) / 2
-                    else:
-                        # Image is taller - fit to height
-                        fit_h = h
-                        fit_w = h * img_aspect
-                        offset_x = (w - fit_w) / 2
-                        offset_y = 0
-                    
-                    # Adjusted position
-                    img_x = x + offset_x
-                    img_y = y + offset_y
-                    
-                    try:
-                        # Create shader for textured quad
-                        texture_shader = gpu.shader.from_builtin('IMAGE')
-                        
-                        # Prepare vertices and UVs
-                        vertices = (
-                            (img_x, img_y), (img_x + fit_w, img_y),
-                            (img_x + fit_w, img_y + fit_h), (img_x, img_y + fit_h)
-                        )
-                        
-                        uvs = (
-                            (0, 0), (1, 0),
-                            (1, 1), (0, 1)
-                        )
-                        
-                        indices = ((0, 1, 2), (2, 3, 0))
-                        
-                        batch = batch_for_shader(
-                            texture_shader, 'TRIS',
-                            {"pos": vertices, "texCoord": uvs},
-                            indices=indices
-                        )
-                        
-                        
-                        # Bind texture and draw
-                        gpu.state.blend_set('ALPHA')
-                        texture_shader.bind()
-                        texture_shader.uniform_sampler("image", gpu.texture.from_image(image))
-                        batch.draw(texture_shader)
-                        gpu.state.blend_set('NONE')
-                        
-                        has_image = True
-                    except Exception as e:
-                        print(f"Error drawing image texture: {e}")
-                        has_image = False
-            except Exception as e:
-                print(f"Error loading image: {e}")
-                has_image = False
-        
-        if not has_image:
-            # Button background (no image or failed to load)
-            if item.is_circle:
-                # Draw as circle
-                import math
-                center_x = x + w / 2
-                center_y = y + h / 2
-                radius = min(w, h) / 2
-                segments = 32
-                
-                # Create circle vertices
-                circle_verts = [(center_x, center_y)]  # Center point first
-                for i in range(segments + 1):
-                    angle = 2 * math.pi * i / segments
-                    circle_verts.append((
-                        center_x + radius * math.cos(angle),
-                        center_y + radius * math.sin(angle)
-                    ))
-                
-                # Create triangles from center
-                circle_indices = []
-                for i in range(1, segments + 1):
-                    circle_indices.append((0, i, i + 1))
-                
-                batch = batch_for_shader(shader, 'TRIS', {"pos": circle_verts}, indices=circle_indices)
-                shader.bind()
-                shader.uniform_float("color", (item.color_r, item.color_g, item.color_b, 0.6))
-                batch.draw(shader)
-            else:
-                # Draw as rectangle
-                vertices = (
-                    (x, y), (x + w, y),
-                    (x + w, y + h), (x, y + h)
-                )
-                
-                indices = ((0, 1, 2), (2, 3, 0))
-                
-                batch = batch_for_shader(shader, 'TRIS', {"pos": vertices}, indices=indices)
-                shader.bind()
-                shader.uniform_float("color", (item.color_r, item.color_g, item.color_b, (0.3 if is_temp_visible else 0.6)))  # Transparent if temp visible
-                batch.draw(shader)
         
-        # Button border - dashed for temp visible
-        vertices_border = (
-            (x, y), (x + w, y),
-            (x + w, y + h), (x, y + h), (x, y)
-        )
-        batch_border = batch_for_shader(shader, 'LINE_STRIP', {"pos": vertices_border})
+        fill_alpha = 0.3 if (is_temp_visible and not item.is_circle) else 0.6  # Transparent if temp visible
+        fill_color = (item.color_r, item.color_g, item.color_b, fill_alpha)
         if is_temp_visible:
-            shader.uniform_float("color", (1.0, 0.5, 0.0, 0.8))  # Orange dashed for temp visible
+            border_color = (1.0, 0.5, 0.0, 0.8)  # Orange dashed for temp visible
         else:
-            shader.uniform_float("color", (0.8, 0.8, 0.8, 1.0))
-        batch_border.draw(shader)
-        
-        # Resize handle (bottom-right corner) - only for rectangles
-        if not item.is_circle:
-            handle_size = 10
-            handle_x = x + w - handle_size
-            handle_y = y
-            handle_vertices = (
-                (handle_x, handle_y), (handle_x + handle_size, handle_y),
-                (handle_x + handle_size, handle_y + handle_size), (handle_x, handle_y + handle_size)
-            )
-            handle_indices = ((0, 1, 2), (2, 3, 0))
-            handle_batch = batch_for_shader(shader, 'TRIS', {"pos": handle_vertices}, indices=handle_indices)
-            shader.uniform_float("color", (0.8, 0.5, 0.2, 0.9))
-            handle_batch.draw(shader)
-        
-        # Button text
-        if not item.is_circle and item.button_label:
-            blf.position(font_id, x + 10, y + h/2 - 5, 0)
-            blf.size(font_id, 12)
-            blf.color(font_id, 1.0, 1.0, 1.0, 1.0)
-            blf.draw(font_id, item.button_label)
+            border_color = (0.8, 0.8, 0.8, 1.0)
+        empty_draws.append((item, fill_color, border_color, True))
+    
+    # The unchanging bottom of the layer comes from the offscreen copy,
+    # buttons from the first non-static one upwards are drawn live
+    static_count = 0
+    while static_count < len(empty_draws) and _is_static_button(empty_draws[static_count][0], show_all_hidden):
+        static_count += 1
+    if not _draw_static_layer(context, shader, empty_draws[:static_count], font_id):
+        static_count = 0
+    
+    _draw_layer(context, shader, 'EMPTY', empty_draws[static_count:], font_id)
     
     # LAYER 2: Draw bone buttons on top (middle layer - always above empty buttons)
+    bone_draws = []
     for item in bone_buttons:
         
         # Check if this bone is selected
@@ -1150,215 +3539,40 @@ def draw_callback_px(self, context):
         
         # Check if this is a temporarily visible hidden button
         is_temp_visible = item.is_hidden and show_all_hidden
-            
-        x = item.pos_x
-        y = item.pos_y
-        w = item.width
-        h = item.height
-        
-        # Check if image exists and draw it (for pose buttons)
-        has_image = False
-        if item.is_pose and item.image_name and item.image_name in bpy.data.images:
-            try:
-                image = bpy.data.images[item.image_name]
-                
-                # Ensure image is loaded - Blender 5 compatible
-                if not image.has_data:
-                    try:
-                        image.reload()
-                    except:
-                        pass
-                
-                # Try to load GPU texture - Blender 5 compatible
-                bindcode = 0
-                try:
-                    if hasattr(image, 'bindcode'):
-                        bindcode = image.bindcode
-                    
-                    if bindcode == 0 and hasattr(image, 'gl_load'):
-                        try:
-                            image.gl_load()
-                            bindcode = image.bindcode if hasattr(image, 'bindcode') else 0
-                        except:
-                            pass
-                except:
-                    pass
-                
-                # Draw image using GPU module
-                if bindcode != 0 or image.has_data:
-                    # Calculate aspect ratio to prevent stretching
-                    img_width = image.size[0] if len(image.size) > 0 else 1
-                    img_height = image.size[1] if len(image.size) > 1 else 1
-                    img_aspect = img_width / img_height if img_height > 0 else 1.0
-                    button_aspect = w / h if h > 0 else 1.0
-                    
-                    # Calculate fitted dimensions
-                    if img_aspect > button_aspect:
-                        # Image is wider - fit to width
-                        fit_w = w
-                        fit_h = w / img_aspect
-                        offset_x = 0
-                        offset_y = (h - fit_h) / 2
-                    else:
-                        # Image is taller - fit to height
-                        fit_h = h
-                        fit_w = h * img_aspect
-                        offset_x = (w - fit_w) / 2
-                        offset_y = 0
-                    
-                    # Adjusted position
-                    img_x = x + offset_x
-                    img_y = y + offset_y
-                    
-                    try:
-                        # Create shader for textured quad
-                        texture_shader = gpu.shader.from_builtin('IMAGE')
-                        
-                        # Prepare vertices and UVs
-                        vertices = (
-                            (img_x, img_y), (img_x + fit_w, img_y),
-                            (img_x + fit_w, img_y + fit_h), (img_x, img_y + fit_h)
-                        )
-                        
-                        uvs = (
-                            (0, 0), (1, 0),
-                            (1, 1), (0, 1)
-                        )
-                        
-                        indices = ((0, 1, 2), (2, 3, 0))
-                        
-                        batch = batch_for_shader(
-                            texture_shader, 'TRIS',
-                            {"pos": vertices, "texCoord": uvs},
-                            indices=indices
-                        )
-                        
-                        
-                        # Bind texture and draw
-                        gpu.state.blend_set('ALPHA')
-                        texture_shader.bind()
-                        texture_shader.uniform_sampler("image", gpu.texture.from_image(image))
-                        batch.draw(texture_shader)
-                        gpu.state.blend_set('NONE')
-                        
-                        has_image = True
-                    except Exception as e:
-                        print(f"Error drawing image texture: {e}")
-                        has_image = False
-            except Exception as e:
-                print(f"Error loading image: {e}")
-                has_image = False
-        
-        # Button background (if no image or not a pose button)
-        if not has_image:
-            if item.is_circle:
-                # Draw as circle
-                import math
-                center_x = x + w / 2
-                center_y = y + h / 2
-                radius = min(w, h) / 2
-                segments = 32
-                
-                # Create circle vertices
-                circle_verts = [(center_x, center_y)]  # Center point first
-                for i in range(segments + 1):
-                    angle = 2 * math.pi * i / segments
-                    circle_verts.append((
-                        center_x + radius * math.cos(angle),
-                        center_y + radius * math.sin(angle)
-                    ))
-                
-                # Create triangles from center
-                circle_indices = []
-                for i in range(1, segments + 1):
-                    circle_indices.append((0, i, i + 1))
-                
-                batch = batch_for_shader(shader, 'TRIS', {"pos": circle_verts}, indices=circle_indices)
-                shader.bind()
-                # Highlight: resizing/dragging > multi-selected > selected > temp-visible > normal
-                if is_resizing or is_alt_dragging:
-                    # Bright white/yellow for resizing/dragging (like pivot point)
-                    shader.uniform_float("color", (1.0, 1.0, 0.5, 1.0))
-                elif is_temp_visible:
-                    # Semi-transparent for temporarily visible hidden buttons
-                    shader.uniform_float("color", (item.color_r, item.color_g, item.color_b, 0.4))
-                elif is_multi_selected:
-                    # Cyan/blue tint for multi-selected buttons
-                    shader.uniform_float("color", (item.color_r * 1.3, item.color_g * 1.3, item.color_b * 1.8, 1.0))
-                elif is_selected:
-                    shader.uniform_float("color", (item.color_r * 1.5, item.color_g * 1.5, item.color_b * 1.5, 1.0))
-                else:
-                    shader.uniform_float("color", (item.color_r, item.color_g, item.color_b, 0.8))
-                batch.draw(shader)
-            else:
-                # Draw as rectangle
-                vertices = (
-                    (x, y), (x + w, y),
-                    (x + w, y + h), (x, y + h)
-                )
-                
-                indices = ((0, 1, 2), (2, 3, 0))
-                
-                batch = batch_for_shader(shader, 'TRIS', {"pos": vertices}, indices=indices)
-                shader.bind()
-                # Highlight: resizing/dragging > multi-selected > selected > temp-visible > normal
-                if is_resizing or is_alt_dragging:
-                    # Bright white/yellow for resizing/dragging (like pivot point)
-                    shader.uniform_float("color", (1.0, 1.0, 0.5, 1.0))
-                elif is_temp_visible:
-                    # Semi-transparent for temporarily visible hidden buttons
-                    shader.uniform_float("color", (item.color_r, item.color_g, item.color_b, 0.4))
-                elif is_multi_selected:
-                    # Cyan/blue tint for multi-selected buttons
-                    shader.uniform_float("color", (item.color_r * 1.3, item.color_g * 1.3, item.color_b * 1.8, 1.0))
-                elif is_selected:
-                    shader.uniform_float("color", (item.color_r * 1.5, item.color_g * 1.5, item.color_b * 1.5, 1.0))
-                else:
-                    shader.uniform_float("color", (item.color_r, item.color_g, item.color_b, 0.8))
-                batch.draw(shader)
         
-        # Button border - thicker for selected/resizing/dragging/multi-selected bones, orange for temp visible
-        border_width = 3.0 if (is_selected or is_resizing or is_alt_dragging or is_multi_selected or is_temp_visible) else 1.0
-        vertices_border = (
-            (x, y), (x + w, y),
-            (x + w, y + h), (x, y + h), (x, y)
-        )
-        batch_border = batch_for_shader(shader, 'LINE_STRIP', {"pos": vertices_border})
+        # Highlight: resizing/dragging > multi-selected > selected > temp-visible > normal
         if is_resizing or is_alt_dragging:
-            shader.uniform_float("color", (1.0, 1.0, 1.0, 1.0))  # White border for resizing/dragging
+            # Bright white/yellow for resizing/dragging (like pivot point)
+            fill_color = (1.0, 1.0, 0.5, 1.0)
+            border_color = (1.0, 1.0, 1.0, 1.0)  # White border for resizing/dragging
         elif is_temp_visible:
-            shader.uniform_float("color", (1.0, 0.5, 0.0, 0.8))  # Orange border for temp visible
+            # Semi-transparent for temporarily visible hidden buttons
+            fill_color = (item.color_r, item.color_g, item.color_b, 0.4)
+            border_color = (1.0, 0.5, 0.0, 0.8)  # Orange border for temp visible
         elif is_multi_selected:
-            shader.uniform_float("color", (0.3, 0.7, 1.0, 1.0))  # Cyan border for multi-selected
+            # Cyan/blue tint for multi-selected buttons
+            fill_color = (item.color_r * 1.3, item.color_g * 1.3, item.color_b * 1.8, 1.0)
+            border_color = (0.3, 0.7, 1.0, 1.0)  # Cyan border for multi-selected
         elif is_selected:
-            shader.uniform_float("color", (1.0, 1.0, 0.0, 1.0))  # Yellow border for selected
+            fill_color = (item.color_r * 1.5, item.color_g * 1.5, item.color_b * 1.5, 1.0)
+            border_color = (1.0, 1.0, 0.0, 1.0)  # Yellow border for selected
+        elif item.is_pose and item.as_pointer() in pose_matches:
+            # Nearest pose search results, the closest one brightest
+            fade = 1.0 - 0.5 * pose_matches[item.as_pointer()] / max(len(pose_matches), 1)
+            fill_color = (item.color_r, item.color_g, item.color_b, 1.0)
+            border_color = (1.0 * fade, 0.3 * fade, 1.0 * fade, 1.0)  # Magenta border for matches
         else:
-            shader.uniform_float("color", (0.8, 0.8, 0.8, 1.0))
-        batch_border.draw(shader)
-        
-        # Resize handle (bottom-right corner) - only for rectangles
-        if not item.is_circle:
-            handle_size = 10
-            handle_x = x + w - handle_size
-            handle_y = y
-            handle_vertices = (
-                (handle_x, handle_y), (handle_x + handle_size, handle_y),
-                (handle_x + handle_size, handle_y + handle_size), (handle_x, handle_y + handle_size)
-            )
-            handle_indices = ((0, 1, 2), (2, 3, 0))
-            handle_batch = batch_for_shader(shader, 'TRIS', {"pos": handle_vertices}, indices=handle_indices)
-            shader.uniform_float("color", (0.8, 0.5, 0.2, 0.9))
-            handle_batch.draw(shader)
-        
-        # Button text
-        if not item.is_circle:
-            blf.position(font_id, x + 10, y + h/2 - 5, 0)
-            blf.size(font_id, 12)
-            blf.color(font_id, 1.0, 1.0, 1.0, 1.0)
-            blf.draw(font_id, item.button_label)
+            fill_color = (item.color_r, item.color_g, item.color_b, 0.8)
+            border_color = (0.8, 0.8, 0.8, 1.0)
+        
+        # Only pose buttons show their image
+        bone_draws.append((item, fill_color, border_color, item.is_pose))
+    
+    _draw_layer(context, shader, 'BONE', bone_draws, font_id)
     
     # LAYER 3: Draw box selection on top of everything (top layer - always visible)
     if hasattr(self, 'box_selecting') and self.box_selecting:
+        shader = gpu.shader.from_builtin('UNIFORM_COLOR')
         min_x = min(self.box_start_x, self.box_end_x)
         max_x = max(self.box_start_x, self.box_end_x)
         min_y = min(self.box_start_y, self.box_end_y)
@@ -1383,6 +3597,8 @@ def draw_callback_px(self, context):
         box_border_batch = batch_for_shader(shader, 'LINE_STRIP', {"pos": box_border})
         shader.uniform_float("color", (0.3, 0.6, 1.0, 0.8))
         box_border_batch.draw(shader)
+    
+    gpu.state.blend_set('NONE')
 
 class BONEPICKER_OT_OpenPickerWindow(Operator):
     """Open Bone Picker Canvas Window"""
@@ -1436,12 +3652,69 @@ class BONEPICKER_OT_OpenPickerWindow(Operator):
     box_end_x = 0
     box_end_y = 0
     
+    # Ctrl+drag pose blending
+    pose_blend = None
+    pose_blend_start_x = 0
+    pose_blend_width = 200
+    
+    # Redraw throttling
+    redraw_timer = None
+    last_redraw_time = 0.0
+    
     @classmethod
     def poll(cls, context):
         return context.active_object and context.active_object.type == 'ARMATURE'
     
+    def get_redraw_state(self, context):
+        """Everything the modal can change that affects the canvas"""
+        return (
+            context.scene.bone_picker_active_section,
+            self.show_all_hidden,
+            self.box_selecting, self.box_end_x, self.box_end_y,
+            tuple(self.selected_buttons),
+            self.interactive_resize_button,
+            self.alt_middle_drag_button,
+        )
+    
     def modal(self, context, event):
+        state = self.get_redraw_state(context)
+        result = self.handle_event(context, event)
+        if 'CANCELLED' not in result:
+            if self.get_redraw_state(context) != state:
+                _tag_canvas_dirty()
+            self.flush_redraw(context, event)
+        return result
+    
+    def flush_redraw(self, context, event):
+        """Redraw the canvas if it changed, at most at the configured rate for mouse moves"""
+        global _canvas_dirty
+        if not _canvas_dirty:
+            return
+        
+        addon = context.preferences.addons.get(__name__)
+        interval = 1.0 / (addon.preferences.max_refresh_rate if addon else 60)
+        now = time.perf_counter()
+        if event.type == 'MOUSEMOVE' and now - self.last_redraw_time < interval:
+            # Coalesce bursts of mouse moves, the timer flushes the last one
+            if self.redraw_timer is None:
+                self.redraw_timer = context.window_manager.event_timer_add(interval, window=context.window)
+            return
+        
+        _canvas_dirty = False
+        self.last_redraw_time = now
         context.area.tag_redraw()
+        self.remove_redraw_timer(context)
+    
+    def remove_redraw_timer(self, context):
+        if self.redraw_timer is not None:
+            context.window_manager.event_timer_remove(self.redraw_timer)
+            self.redraw_timer = None
+    
+    def handle_event(self, context, event):
+        # ESC or right click while blending a pose goes back to where it started
+        if self.pose_blend and event.type in {'ESC', 'RIGHTMOUSE'} and event.value == 'PRESS':
+            self.end_pose_blend(context, cancel=True)
+            return {'RUNNING_MODAL'}
         
         # Close only on ESC or Close button
         if event.type == 'ESC':
@@ -1506,21 +3779,12 @@ class BONEPICKER_OT_OpenPickerWindow(Operator):
                     active_section = context.scene.bone_picker_active_section if hasattr(context.scene, 'bone_picker_active_section') else "1"
                     
                     # Check if clicking on a button (only from active section)
-                    sorted_buttons = sorted(
-                        [btn for btn in context.scene.bone_picker_buttons if (btn.section if btn.section else "1") == active_section],
-                        key=lambda x: (not x.is_empty, x.z_order),
-                        reverse=True
-                    )
-                    
+                    # Hidden buttons only count if show_all_hidden is active
+                    buttons = context.scene.bone_picker_buttons
                     clicked_button = None
-                    for item in sorted_buttons:
-                        if item.is_hidden:
-                            # Allow interaction with hidden buttons if show_all_hidden is active
-                            if not self.show_all_hidden:
-                                continue
-                        if self.is_point_in_button(event.mouse_region_x, event.mouse_region_y, item):
-                            clicked_button = item
-                            break
+                    for index in _buttons_at(buttons, active_section, event.mouse_region_x, event.mouse_region_y, self.show_all_hidden):
+                        clicked_button = buttons[index]
+                        break
                     
                     if clicked_button:
                         # Alt+Middle mouse = drag button position
@@ -1568,6 +3832,10 @@ class BONEPICKER_OT_OpenPickerWindow(Operator):
             
             if event.type == 'LEFTMOUSE':
                 if event.value == 'PRESS':
+                    # Ctrl+drag on a pose button blends toward its pose
+                    if event.ctrl and self.start_pose_blend(context, event):
+                        return {'RUNNING_MODAL'}
+                    
                     # Check if Alt is held for box selection
                     if event.alt:
                         self.box_selecting = True
@@ -1580,63 +3848,55 @@ class BONEPICKER_OT_OpenPickerWindow(Operator):
                     # Check if clicking on resize handle first (skip locked buttons)
                     active_section = context.scene.bone_picker_active_section if hasattr(context.scene, 'bone_picker_active_section') else "1"
                     
-                    for item in context.scene.bone_picker_buttons:
-                        # Only check buttons from active section
-                        item_section = item.section if item.section else "1"
-                        if item_section != active_section:
-                            continue
+                    buttons = context.scene.bone_picker_buttons
+                    for index in _buttons_at(buttons, active_section, event.mouse_region_x, event.mouse_region_y,
+                                             self.show_all_hidden, resize_handle=True):
+                        item = buttons[index]
                         if item.is_locked:
                             continue
-                        if item.is_hidden and not self.show_all_hidden:
-                            continue
-                        if self.is_point_in_resize_handle(event.mouse_region_x, event.mouse_region_y, item):
-                            self.resizing_button = item
-                            self.resize_start_width = item.width
-                            self.resize_start_height = item.height
-                            self.resize_start_x = event.mouse_region_x
-                            self.resize_start_y = event.mouse_region_y
-                            return {'RUNNING_MODAL'}
+                        self.resizing_button = item
+                        self.resize_start_width = item.width
+                        self.resize_start_height = item.height
+                        self.resize_start_x = event.mouse_region_x
+                        self.resize_start_y = event.mouse_region_y
+                        return {'RUNNING_MODAL'}
                     
                     # Check if clicking on a button (skip locked buttons for dragging)
-                    # Sort by z_order and layer - check top buttons first
-                    sorted_buttons = sorted(
-                        [btn for btn in context.scene.bone_picker_buttons if (btn.section if btn.section else "1") == active_section],
-                        key=lambda x: (not x.is_empty, x.z_order),
-                        reverse=True
-                    )
-                    
-                    for item in sorted_buttons:
-                        if item.is_hidden and not self.show_all_hidden:
-                            continue
-                        if self.is_point_in_button(event.mouse_region_x, event.mouse_region_y, item):
-                            if not item.is_locked:
-                                # Check if Shift is held for multi-selection
-                                if event.shift:
-                                    # Toggle selection
-                                    if item in self.selected_buttons:
-                                        self.selected_buttons.remove(item)
-                                    else:
-                                        self.selected_buttons.append(item)
-                                    return {'RUNNING_MODAL'}
+                    # Top buttons are checked first
+                    for index in _buttons_at(buttons, active_section, event.mouse_region_x, event.mouse_region_y, self.show_all_hidden):
+                        item = buttons[index]
+                        if not item.is_locked:
+                            # Check if Shift is held for multi-selection
+                            if event.shift:
+                                # Toggle selection
+                                if item in self.selected_buttons:
+                                    self.selected_buttons.remove(item)
                                 else:
-                                    # Single selection - start drag
-                                    if item not in self.selected_buttons:
-                                        self.selected_buttons = [item]
-                                    
-                                    # Start multi-drag
-                                    self.multi_dragging = True
-                                    self.multi_drag_start_x = event.mouse_region_x
-                                    self.multi_drag_start_y = event.mouse_region_y
-                                    
-                                    self.dragging_button = item
-                                    self.drag_offset_x = event.mouse_region_x - item.pos_x
-                                    self.drag_offset_y = event.mouse_region_y - item.pos_y
-                            self.click_start_x = event.mouse_region_x
-                            self.click_start_y = event.mouse_region_y
-                            self.clicked_button = item
-                            return {'RUNNING_MODAL'}
+                                    self.selected_buttons.append(item)
+                                return {'RUNNING_MODAL'}
+                            else:
+                                # Single selection - start drag
+                                if item not in self.selected_buttons:
+                                    self.selected_buttons = [item]
+                                
+                                # Start multi-drag
+                                self.multi_dragging = True
+                                self.multi_drag_start_x = event.mouse_region_x
+                                self.multi_drag_start_y = event.mouse_region_y
+                                
+                                self.dragging_button = item
+                                self.drag_offset_x = event.mouse_region_x - item.pos_x
+                                self.drag_offset_y = event.mouse_region_y - item.pos_y
+                        self.click_start_x = event.mouse_region_x
+                        self.click_start_y = event.mouse_region_y
+                        self.clicked_button = item
+                        return {'RUNNING_MODAL'}
                 
                 elif event.value == 'RELEASE':
+                    if self.pose_blend:
+                        self.end_pose_blend(context)
+                        return {'RUNNING_MODAL'}
+                    
                     # Handle box selection
                     if self.box_selecting:
                         self.box_selecting = False
@@ -1646,15 +3906,12 @@ class BONEPICKER_OT_OpenPickerWindow(Operator):
                         min_y = min(self.box_start_y, self.box_end_y)
                         max_y = max(self.box_start_y, self.box_end_y)
                         
-                        # If not shift, deselect all first
-                        if not event.shift:
-                            bpy.ops.pose.select_all(action='DESELECT')
-                        
                         # Get active section
                         active_section = context.scene.bone_picker_active_section if hasattr(context.scene, 'bone_picker_active_section') else "1"
                         
                         # Select bones whose buttons are in the box (only from active section)
                         bones_to_select = []
+                        bone_indices = _bone_index_map(context.active_object, 'POSE')
                         for item in context.scene.bone_picker_buttons:
                             # Only check buttons from active section
                             item_section = item.section if item.section else "1"
@@ -1669,9 +3926,17 @@ class BONEPICKER_OT_OpenPickerWindow(Operator):
                             btn_center_y = item.pos_y + item.height / 2
                             if (min_x <= btn_center_x <= max_x and 
                                 min_y <= btn_center_y <= max_y):
-                                if item.bone_name in context.active_object.pose.bones:
+                                if item.bone_name in bone_indices:
                                     bones_to_select.append(item.bone_name)
                         
+                        # Select all bones in one pass, if not shift deselect the others
+                        if _select_bones(context.active_object, bones_to_select, 'SELECT', extend=event.shift):
+                            return {'RUNNING_MODAL'}
+                        
+                        # If not shift, deselect all first
+                        if not event.shift:
+                            bpy.ops.pose.select_all(action='DESELECT')
+                        
                         # Blender 5.0 compatible: Select bones via edit mode
                         if bones_to_select:
                             try:
@@ -1690,6 +3955,8 @@ class BONEPICKER_OT_OpenPickerWindow(Operator):
                                 except:
                                     pass
                         
+                        # Bone selection changed
+                        _tag_selection_changed()
                         return {'RUNNING_MODAL'}
                     
                     if self.resizing_button:
@@ -1704,7 +3971,13 @@ class BONEPICKER_OT_OpenPickerWindow(Operator):
                             # Check if it's a pose button
                             if self.dragging_button.is_pose:
                                 # Apply pose
-                                bpy.ops.bonepicker.apply_pose(pose_data_json=self.dragging_button.pose_data)
+                                bpy.ops.bonepicker.apply_pose(
+                                    button_index=_button_index(self.dragging_button),
+                                    insert_keys=context.scene.bone_picker_key_poses,
+                                    mirror=context.scene.bone_picker_mirror_poses,
+                                    channels=context.scene.bone_picker_pose_channels,
+                                    selected_only=context.scene.bone_picker_pose_selected_only
+                                )
                             elif not self.dragging_button.is_empty:
                                 # Select the bone
                                 add_to_selection = event.shift
@@ -1733,7 +4006,13 @@ class BONEPICKER_OT_OpenPickerWindow(Operator):
                             # Check if it's a pose button
                             if self.clicked_button.is_pose:
                                 # Apply pose
-                                bpy.ops.bonepicker.apply_pose(pose_data_json=self.clicked_button.pose_data)
+                                bpy.ops.bonepicker.apply_pose(
+                                    button_index=_button_index(self.clicked_button),
+                                    insert_keys=context.scene.bone_picker_key_poses,
+                                    mirror=context.scene.bone_picker_mirror_poses,
+                                    channels=context.scene.bone_picker_pose_channels,
+                                    selected_only=context.scene.bone_picker_pose_selected_only
+                                )
                             elif not self.clicked_button.is_empty:
                                 # Select the bone
                                 add_to_selection = event.shift
@@ -1745,6 +4024,10 @@ class BONEPICKER_OT_OpenPickerWindow(Operator):
                         return {'RUNNING_MODAL'}
             
             if event.type == 'MOUSEMOVE':
+                if self.pose_blend:
+                    self.update_pose_blend(context, event.mouse_region_x)
+                    return {'RUNNING_MODAL'}
+                
                 # Alt+Middle mouse drag
                 if self.alt_middle_dragging and self.alt_middle_drag_button:
                     self.alt_middle_drag_button.pos_x = event.mouse_region_x - self.alt_middle_drag_offset_x
@@ -1802,6 +4085,53 @@ class BONEPICKER_OT_OpenPickerWindow(Operator):
         
         return {'PASS_THROUGH'}
     
+    def start_pose_blend(self, context, event):
+        """Start blending toward the pose button under the mouse, returns False if there is none"""
+        buttons = context.scene.bone_picker_buttons
+        active_section = context.scene.bone_picker_active_section if hasattr(context.scene, 'bone_picker_active_section') else "1"
+        hits = _buttons_at(buttons, active_section, event.mouse_region_x, event.mouse_region_y, self.show_all_hidden)
+        if not hits or not buttons[hits[0]].is_pose:
+            return False
+        
+        obj = context.active_object
+        try:
+            pose = _get_button_pose(buttons[hits[0]])
+            if pose is None:
+                return False
+            if context.scene.bone_picker_mirror_poses:
+                pose = _mirror_pose(obj, pose)
+            mask = _pose_apply_mask(context, obj, context.scene.bone_picker_pose_channels,
+                                    context.scene.bone_picker_pose_selected_only)
+            self.pose_blend = _PoseBlend(obj, pose, mask)
+        except Exception as e:
+            self.report({'ERROR'}, f"Failed to blend pose: {str(e)}")
+            return False
+        
+        # Dragging across the button's width goes all the way to the saved pose
+        self.pose_blend_start_x = event.mouse_region_x
+        self.pose_blend_width = max(buttons[hits[0]].width, 50)
+        context.area.header_text_set("Blend Pose: 0%  (ESC/Right Click to cancel)")
+        return True
+    
+    def update_pose_blend(self, context, x):
+        factor = min(max((x - self.pose_blend_start_x) / self.pose_blend_width, 0.0), 1.0)
+        self.pose_blend.evaluate(factor)
+        context.area.header_text_set(f"Blend Pose: {factor:.0%}  (ESC/Right Click to cancel)")
+        _tag_canvas_dirty()
+    
+    def end_pose_blend(self, context, cancel=False):
+        """Keep the blended pose as one undo step, or put the start pose back"""
+        # A click without dragging, or a drag back to 0%, changed nothing
+        if cancel or self.pose_blend.factor <= 0.0:
+            self.pose_blend.restore()
+        else:
+            if context.scene.bone_picker_key_poses:
+                _insert_pose_keys(context, self.pose_blend.obj, self.pose_blend.bones, self.pose_blend.channels)
+            bpy.ops.ed.undo_push(message="Blend Pose")
+        self.pose_blend = None
+        context.area.header_text_set(None)
+        _tag_canvas_dirty()
+    
     def invoke(self, context, event):
         global _draw_handler, _picker_window_active
         
@@ -1824,30 +4154,55 @@ class BONEPICKER_OT_OpenPickerWindow(Operator):
     def cancel(self, context):
         global _draw_handler, _picker_window_active
         
+        if self.pose_blend:
+            self.end_pose_blend(context, cancel=True)
         if _draw_handler:
             SpaceView3D.draw_handler_remove(_draw_handler, 'WINDOW')
             _draw_handler = None
         _picker_window_active = False
+        self.remove_redraw_timer(context)
         context.area.tag_redraw()
-    
-    def is_point_in_button(self, x, y, button):
-        return (button.pos_x <= x <= button.pos_x + button.width and
-                button.pos_y <= y <= button.pos_y + button.height)
-    
-    def is_point_in_resize_handle(self, x, y, button):
-        handle_size = 10
-        handle_x = button.pos_x + button.width - handle_size
-        handle_y = button.pos_y
-        return (handle_x <= x <= handle_x + handle_size and
-                handle_y <= y <= handle_y + handle_size)
 
 class BONEPICKER_AddonPreferences(bpy.types.AddonPreferences):
     """Addon preferences with keybinding information"""
     bl_idname = __name__
     
+    texture_budget_mb: IntProperty(
+        name="Texture Budget (MB)",
+        description="GPU memory kept for button images before the least recently used ones are freed",
+        default=256,
+        min=16,
+        max=8192
+    )
+    max_refresh_rate: IntProperty(
+        name="Max Canvas Refresh Rate",
+        description="Highest number of canvas redraws per second while dragging",
+        default=60,
+        min=10,
+        max=240
+    )
+    pose_library_path: StringProperty(
+        name="Pose Library",
+        description="SQLite file of the shared pose library, a file in Blender's user data folder when empty",
+        subtype='FILE_PATH',
+        default=""
+    )
+    
     def draw(self, context):
         layout = self.layout
         
+        box = layout.box()
+        box.label(text="Performance:", icon='MEMORY')
+        box.prop(self, "texture_budget_mb")
+        box.prop(self, "max_refresh_rate")
+        box.label(text=f"Cached textures: {len(_loaded_textures)} ({_loaded_textures_bytes / (1024 * 1024):.1f} MB)")
+        box.label(text=f"Atlas pages: {len(_atlas_pages)} ({len(_atlas_slots)} images)")
+        box.operator("bonepicker.benchmark_poses", icon='TIME')
+        
+        box = layout.box()
+        box.label(text="Pose Library:", icon='ASSET_MANAGER')
+        box.prop(self, "pose_library_path")
+        
         box = layout.box()
         box.label(text="Keyboard Shortcuts:", icon='KEYINGSET')
         
@@ -1945,6 +4300,16 @@ class BONEPICKER_PT_MainPanel(Panel):
         # Pose Library
         row = box.row()
         row.operator("bonepicker.save_pose", text="Save Pose", icon='ARMATURE_DATA')
+        row.prop(context.scene, "bone_picker_key_poses", text="Key", icon='KEY_HLT')
+        row.prop(context.scene, "bone_picker_mirror_poses", text="Mirror", icon='MOD_MIRROR')
+        row = box.row(align=True)
+        row.prop(context.scene, "bone_picker_pose_channels", expand=True)
+        row.prop(context.scene, "bone_picker_pose_selected_only", text="", icon='RESTRICT_SELECT_OFF')
+        row = box.row()
+        row.operator("bonepicker.load_library_poses", text="Load Library Poses", icon='ASSET_MANAGER')
+        row.operator("bonepicker.find_nearest_poses", text="Find Nearest", icon='VIEWZOOM')
+        if _get_pose_matches(context.scene.bone_picker_buttons):
+            row.operator("bonepicker.clear_pose_matches", text="", icon='X')
         
         layout.separator()
         
@@ -1964,6 +4329,9 @@ class BONEPICKER_PT_MainPanel(Panel):
         row.operator("bonepicker.hide_all", text="Hide All", icon='HIDE_ON')
         row.operator("bonepicker.unhide_all", text="Unhide All", icon='HIDE_OFF')
         
+        row = box.row(align=True)
+        row.operator("bonepicker.report_missing_bones", icon='ERROR')
+        
         layout.separator()
         
         # Manage buttons section with expand/collapse
@@ -1983,6 +4351,9 @@ class BONEPICKER_PT_MainPanel(Panel):
             if len(scene.bone_picker_buttons) == 0:
                 box.label(text="No buttons created yet")
             else:
+                # Selected bones for highlighting rows
+                selected_bone_names = _get_selected_bone_names(context)
+                
                 # Group buttons by section
                 sections = {}
                 for i, item in enumerate(scene.bone_picker_buttons):
@@ -2023,12 +4394,7 @@ class BONEPICKER_PT_MainPanel(Panel):
                             row.label(text=layer_text + "[Pose] " + item.button_label, icon='ARMATURE_DATA')
                         else:
                             # Check if bone is selected
-                            is_selected = False
-                            if context.active_object and context.active_object.type == 'ARMATURE':
-                                try:
-                                    is_selected = item.bone_name in {bone.name for bone in context.selected_pose_bones}
-                                except:
-                                    pass
+                            is_selected = item.bone_name in selected_bone_names
                             
                             # Highlight selected bones in panel
                             if is_selected:
@@ -2074,6 +4440,11 @@ class BONEPICKER_PT_MainPanel(Panel):
                             op = row.operator("bonepicker.capture_viewport", text="", icon='CAMERA_DATA')
                             op.button_index = i
                         
+                        # Store in the shared pose library (pose buttons)
+                        if item.is_pose:
+                            op = row.operator("bonepicker.store_library_pose", text="", icon='ASSET_MANAGER')
+                            op.index = i
+                        
                         # Resize button
                         op = row.operator("bonepicker.resize_button", text="", icon='FULLSCREEN_ENTER')
                         op.index = i
@@ -2091,6 +4462,10 @@ classes = (
     BONEPICKER_OT_AddEmptyButton,
     BONEPICKER_OT_SavePose,
     BONEPICKER_OT_ApplyPose,
+    BONEPICKER_OT_StoreLibraryPose,
+    BONEPICKER_OT_LoadLibraryPoses,
+    BONEPICKER_OT_FindNearestPoses,
+    BONEPICKER_OT_ClearPoseMatches,
     BONEPICKER_OT_CaptureViewport,
     BONEPICKER_OT_RemoveButton,
     BONEPICKER_OT_RenameButton,
@@ -2108,6 +4483,8 @@ classes = (
     BONEPICKER_OT_UnlockAllBone,
     BONEPICKER_OT_HideAll,
     BONEPICKER_OT_UnhideAll,
+    BONEPICKER_OT_ReportMissingBones,
+    BONEPICKER_OT_BenchmarkPoses,
     BONEPICKER_OT_SetSection,
     BONEPICKER_OT_SwitchSection,
     BONEPICKER_OT_HideSection,
@@ -2132,6 +4509,39 @@ def register():
         description="Currently active section (1-9)",
         default="1"
     )
+    bpy.types.Scene.bone_picker_key_poses = BoolProperty(
+        name="Key Applied Poses",
+        description="Insert keyframes on the current frame for bones posed by pose buttons",
+        default=False
+    )
+    bpy.types.Scene.bone_picker_mirror_poses = BoolProperty(
+        name="Mirror Applied Poses",
+        description="Apply poses from pose buttons flipped across the X axis, left and right swapped",
+        default=False
+    )
+    bpy.types.Scene.bone_picker_pose_channels = EnumProperty(
+        name="Pose Channels",
+        description="Transform channels pose buttons apply",
+        items=_POSE_CHANNEL_ITEMS,
+        options={'ENUM_FLAG'},
+        default={'LOCATION', 'ROTATION', 'SCALE'}
+    )
+    bpy.types.Scene.bone_picker_pose_selected_only = BoolProperty(
+        name="Pose Selected Bones Only",
+        description="Pose buttons only pose the bones that are selected",
+        default=False
+    )
+    
+    for handlers in (bpy.app.handlers.load_post, bpy.app.handlers.undo_post, bpy.app.handlers.redo_post):
+        if _on_buttons_reloaded not in handlers:
+            handlers.append(_on_buttons_reloaded)
+    
+    # Keep the selected bone cache up to date
+    if _on_depsgraph_update not in bpy.app.handlers.depsgraph_update_post:
+        bpy.app.handlers.depsgraph_update_post.append(_on_depsgraph_update)
+    if _on_file_loaded not in bpy.app.handlers.load_post:
+        bpy.app.handlers.load_post.append(_on_file_loaded)
+    _subscribe_bone_notifications()
     
     # Register keymaps
     wm = bpy.context.window_manager
@@ -2147,12 +4557,37 @@ def register():
         # addon_keymaps.append((km, kmi))
 
 def unregister():
-    global _draw_handler, _picker_window_active
+    global _draw_handler, _picker_window_active, _loaded_textures_bytes, _draw_order_key
     
     if _draw_handler:
         SpaceView3D.draw_handler_remove(_draw_handler, 'WINDOW')
         _draw_handler = None
     _picker_window_active = False
+    _batch_cache.clear()
+    _layer_batch_cache.clear()
+    _loaded_textures.clear()
+    _loaded_textures_bytes = 0
+    _clear_atlas()
+    _free_static_layer()
+    _draw_order.clear()
+    _draw_order_key = None
+    
+    for handlers in (bpy.app.handlers.load_post, bpy.app.handlers.undo_post, bpy.app.handlers.redo_post):
+        if _on_buttons_reloaded in handlers:
+            handlers.remove(_on_buttons_reloaded)
+    
+    if _on_depsgraph_update in bpy.app.handlers.depsgraph_update_post:
+        bpy.app.handlers.depsgraph_update_post.remove(_on_depsgraph_update)
+    if _on_file_loaded in bpy.app.handlers.load_post:
+        bpy.app.handlers.load_post.remove(_on_file_loaded)
+    bpy.msgbus.clear_by_owner(_selection_msgbus_owner)
+    _selected_bones.clear()
+    _bone_indices.clear()
+    _pose_cache.clear()
+    _symmetry_maps.clear()
+    _close_library()
+    _pose_matrices.clear()
+    _pose_matches.clear()
     
     # Unregister keymaps
     # for km, kmi in addon_keymaps:
@@ -2165,6 +4600,10 @@ def unregister():
     del bpy.types.Scene.bone_picker_buttons
     del bpy.types.Scene.bone_picker_show_manage
     del bpy.types.Scene.bone_picker_active_section
+    del bpy.types.Scene.bone_picker_key_poses
+    del bpy.types.Scene.bone_picker_mirror_poses
+    del bpy.types.Scene.bone_picker_pose_channels
+    del bpy.types.Scene.bone_picker_pose_selected_only
 
 if __name__ == "__main__":
     register()